@@ -2,8 +2,9 @@
 Configuración centralizada de la aplicación
 Carga las variables de entorno desde .env
 """
+from functools import cached_property, lru_cache
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import List, Optional, Set
 
 
 class Settings(BaseSettings):
@@ -16,11 +17,25 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     DB_NAME: str
+    SQL_ECHO: bool = False
+    # Pool por proceso: cada worker de uvicorn (WORKERS) abre el suyo, así que el
+    # máximo de conexiones es WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) y debe
+    # quedar por debajo de max_connections de MySQL. Dentro de un worker las
+    # consultas corren en el threadpool de FastAPI (40 hilos): 20 + 20 lo cubre
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_QUERY_CACHE_SIZE: int = 1200
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    USER_CACHE_TTL_SECONDS: int = 30
+    PREGUNTAS_CACHE_TTL_SECONDS: int = 60
+    FORMULARIOS_CACHE_TTL_SECONDS: int = 30
+    ULTIMO_ACCESO_FLUSH_SECONDS: int = 30
     
     # CORS
     ALLOWED_ORIGINS: str
@@ -29,6 +44,11 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = True
+    WORKERS: int = 1
+    # Revalidar las respuestas contra su response_model antes de serializarlas.
+    # En producción se serializan directamente (los datos salen de la propia BD);
+    # activarlo en desarrollo y pruebas para detectar desajustes con los schemas
+    VALIDATE_RESPONSES: bool = False
     
     # Application
     APP_NAME: str = "Performia API"
@@ -42,10 +62,25 @@ class Settings(BaseSettings):
     EMAIL_FROM: str = ""
     FRONTEND_URL: str = "http://localhost:4200"
     
-    @property
+    # Cola de tareas (Celery)
+    CELERY_BROKER_URL: str = "redis://localhost:6379/0"
+    
+    # Redis para datos efímeros (códigos de recuperación)
+    REDIS_URL: str = "redis://localhost:6379/1"
+    RESET_CODE_TTL_SECONDS: int = 900
+    
+    # Módulos cuyos routers no se registran (ej: "reportes" en workers solo-API)
+    DISABLED_MODULES: str = ""
+    
+    @cached_property
     def cors_origins(self) -> List[str]:
-        """Convierte ALLOWED_ORIGINS a lista"""
-        return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
+        """Convierte ALLOWED_ORIGINS a lista (se calcula una sola vez)"""
+        return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",") if origin.strip()]
+    
+    @cached_property
+    def disabled_modules(self) -> Set[str]:
+        """Convierte DISABLED_MODULES a conjunto (se calcula una sola vez)"""
+        return {modulo.strip() for modulo in self.DISABLED_MODULES.split(",") if modulo.strip()}
     
     class Config:
         env_file = ".env"
@@ -53,5 +88,11 @@ class Settings(BaseSettings):
         extra = "ignore"  # Permite variables extra en .env sin error
 
 
+@lru_cache
+def get_settings() -> Settings:
+    """Obtiene la configuración (se construye una sola vez por proceso)"""
+    return Settings()
+
+
 # Instancia única de configuración
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
\ No newline at end of file
@@ -1,18 +1,27 @@
 """
 Configuración de la base de datos con SQLAlchemy
 """
-from sqlalchemy import create_engine
+from decimal import Decimal
+from sqlalchemy import DateTime, Numeric, create_engine, inspect
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 from app.core.config import settings
 
 # Crear engine de SQLAlchemy
+# Sin pre-ping: una conexión caída lanza OperationalError, SQLAlchemy la detecta
+# como desconexión e invalida el pool, y la siguiente petición reconecta
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,  # Mostrar SQL en consola si DEBUG=True
-    pool_pre_ping=True,   # Verificar conexión antes de usar
-    pool_recycle=3600,    # Reciclar conexiones cada hora
+    echo=settings.SQL_ECHO,                     # Mostrar SQL en consola (independiente de DEBUG)
+    pool_size=settings.DB_POOL_SIZE,            # Conexiones persistentes (threadpool de FastAPI = 40)
+    max_overflow=settings.DB_MAX_OVERFLOW,      # Conexiones extra en picos
+    pool_recycle=settings.DB_POOL_RECYCLE,      # Reciclar antes del wait_timeout de MySQL
+    pool_pre_ping=settings.DB_POOL_PRE_PING,    # Evita un SELECT 1 por checkout
+    pool_use_lifo=True,                         # Reusar las conexiones más recientes
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,  # SQL compilado por estructura de consulta
 )
 
 # Session factory
@@ -26,6 +35,64 @@ SessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+class utcnow(FunctionElement):
+    """
+    Hora actual en UTC calculada por la base de datos
+    Las columnas de fecha guardan UTC naive (antes datetime.utcnow en Python);
+    NOW() de MySQL usaría la zona horaria de la sesión
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, "mysql")
+def _utcnow_mysql(element, compiler, **kw):
+    return "UTC_TIMESTAMP()"
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    # SQLite (y el estándar) devuelven CURRENT_TIMESTAMP en UTC
+    return "CURRENT_TIMESTAMP"
+
+
+def _ajustar_numericos(db: Session) -> None:
+    """
+    Redondea los valores Numeric pendientes de escribir a la escala de su
+    columna, como los guardará la BD (1.0 o Decimal('2') -> Decimal('2.00')),
+    para que el objeto sin recargar coincida con lo que devolvería una lectura
+    """
+    for obj in (*db.new, *db.dirty):
+        estado = inspect(obj)
+        for columna in estado.mapper.columns:
+            if not isinstance(columna.type, Numeric) or columna.type.scale is None:
+                continue
+            # state.dict: no dispara la carga de atributos expirados
+            valor = estado.dict.get(columna.key)
+            if valor is None or isinstance(valor, bool):
+                continue
+            ajustado = Decimal(str(valor)).quantize(Decimal(1).scaleb(-columna.type.scale))
+            if type(valor) is not Decimal or valor.as_tuple() != ajustado.as_tuple():
+                setattr(obj, columna.key, ajustado)
+
+
+def commit_sin_expirar(db: Session) -> None:
+    """
+    Confirma la transacción sin expirar los objetos de la sesión
+    Para devolver lo recién escrito sin releerlo (db.refresh): los valores por
+    defecto de los modelos se calculan en Python y ya están en el objeto tras
+    el flush, y los Numeric se redondean antes a la escala de la columna.
+    Lo escrito con sentencias masivas (Core) sí hay que recargarlo
+    """
+    _ajustar_numericos(db)
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependencia para obtener una sesión de base de datos
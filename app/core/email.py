@@ -1,22 +1,142 @@
 """
 Servicio de envío de correos electrónicos
 """
+import atexit
+import logging
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from functools import lru_cache
+from email.message import EmailMessage
+from string import Template
 from typing import Optional
-import os
-from dotenv import load_dotenv
+from app.core.config import settings
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Configuración de email
-EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
-EMAIL_USER = os.getenv("EMAIL_USER", "")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
-EMAIL_FROM = os.getenv("EMAIL_FROM", EMAIL_USER)
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:4200")
+
+def _email_from() -> str:
+    """Remitente configurado (por defecto el usuario SMTP)"""
+    return settings.EMAIL_FROM or settings.EMAIL_USER
+
+
+# Reutilización de conexiones SMTP
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+_smtp_local = threading.local()
+_smtp_connections: set = set()
+_smtp_connections_lock = threading.Lock()
+
+
+def _open_smtp_connection() -> smtplib.SMTP:
+    """Abre una conexión SMTP autenticada (SMTP + STARTTLS + LOGIN)"""
+    server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
+    server.ehlo()
+    server.starttls()
+    server.ehlo()
+    server.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
+    return server
+
+
+def _quit_smtp_connection(server: smtplib.SMTP) -> None:
+    """Cierra una conexión SMTP ignorando errores de red"""
+    with _smtp_connections_lock:
+        _smtp_connections.discard(server)
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _drop_smtp_connection() -> None:
+    """Descarta la conexión SMTP cacheada en el hilo actual"""
+    server = getattr(_smtp_local, "conn", None)
+    _smtp_local.conn = None
+    _smtp_local.key = None
+    _smtp_local.sent = 0
+    if server is not None:
+        _quit_smtp_connection(server)
+
+
+def get_smtp_connection() -> smtplib.SMTP:
+    """
+    Obtiene la conexión SMTP del hilo actual, reutilizándola si sigue viva
+    
+    La conexión se recicla después de SMTP_MAX_MESSAGES_PER_CONNECTION mensajes
+    o si cambia la configuración (host, puerto, usuario).
+    """
+    key = (settings.EMAIL_HOST, settings.EMAIL_PORT, settings.EMAIL_USER)
+    server = getattr(_smtp_local, "conn", None)
+    
+    if server is not None:
+        expired = (
+            _smtp_local.key != key or
+            _smtp_local.sent >= SMTP_MAX_MESSAGES_PER_CONNECTION
+        )
+        if not expired:
+            try:
+                if server.noop()[0] == 250:
+                    server.rset()
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+        _drop_smtp_connection()
+    
+    server = _open_smtp_connection()
+    _smtp_local.conn = server
+    _smtp_local.key = key
+    _smtp_local.sent = 0
+    with _smtp_connections_lock:
+        _smtp_connections.add(server)
+    return server
+
+
+def close_smtp_connections() -> None:
+    """Cierra todas las conexiones SMTP cacheadas (apagado de la aplicación)"""
+    with _smtp_connections_lock:
+        servers = list(_smtp_connections)
+    for server in servers:
+        _quit_smtp_connection(server)
+
+
+atexit.register(close_smtp_connections)
+
+
+def _send_message(server: smtplib.SMTP, message: EmailMessage) -> None:
+    """Envía el mensaje como bytes, declarando 8BITMIME si el servidor lo soporta"""
+    mail_options = ("BODY=8BITMIME",) if server.has_extn("8bitmime") else ()
+    server.send_message(message, mail_options=mail_options)
+
+
+def _sendmail(message: EmailMessage) -> None:
+    """Envía un mensaje por la conexión cacheada, reconectando una vez si se cayó"""
+    try:
+        _send_message(get_smtp_connection(), message)
+    except (smtplib.SMTPException, OSError):
+        _drop_smtp_connection()
+        _send_message(get_smtp_connection(), message)
+    _smtp_local.sent += 1
+
+
+@lru_cache(maxsize=32)
+def _header_prototype(subject: str, email_from: str) -> tuple:
+    """
+    Cabeceras fijas de una plantilla (Subject/From) ya procesadas por la
+    policy de email; se parsean una vez y se reutilizan en cada envío
+    """
+    prototype = EmailMessage()
+    prototype["Subject"] = subject
+    prototype["From"] = email_from
+    return tuple(prototype.raw_items())
+
+
+def _build_message(to_email: str, subject: str, html_content: str) -> EmailMessage:
+    """Crea el mensaje (HTML en UTF-8 sin recodificar a base64/quoted-printable)"""
+    message = EmailMessage()
+    for name, value in _header_prototype(subject, _email_from()):
+        message.set_raw(name, value)
+    message["To"] = to_email
+    message.set_content(html_content, subtype="html", charset="utf-8", cte="8bit")
+    return message
 
 
 def send_email(to_email: str, subject: str, html_content: str) -> bool:
@@ -32,65 +152,50 @@ def send_email(to_email: str, subject: str, html_content: str) -> bool:
         True si se envió correctamente, False si hubo error
     """
     try:
-        # Crear mensaje
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = EMAIL_FROM
-        message["To"] = to_email
-        
-        # Agregar contenido HTML
-        html_part = MIMEText(html_content, "html")
-        message.attach(html_part)
+        message = _build_message(to_email, subject, html_content)
         
-        # Conectar y enviar
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_FROM, to_email, message.as_string())
+        # Enviar reutilizando la conexión SMTP del hilo
+        _sendmail(message)
         
-        print(f"✅ Correo enviado a {to_email}")
+        logger.info("Correo enviado a %s", to_email)
         return True
         
-    except Exception as e:
-        print(f"❌ Error enviando correo a {to_email}: {str(e)}")
+    except Exception:
+        logger.exception("Error enviando correo a %s", to_email)
         return False
 
 
-def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
-    """
-    Envía correo de confirmación de cuenta
-    """
-    confirmation_url = f"{FRONTEND_URL}/auth/confirmar-correo/{token}"
-    
-    subject = "Confirma tu cuenta en Performia"
-    
-    html_content = f"""
+# ============================================
+# PLANTILLAS HTML (compiladas una sola vez al importar)
+# ============================================
+
+_CONFIRMATION_TEMPLATE = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="UTF-8">
         <style>
-            body {{
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 line-height: 1.6;
                 color: #333;
                 max-width: 600px;
                 margin: 0 auto;
                 padding: 20px;
-            }}
-            .header {{
+            }
+            .header {
                 background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%);
                 color: white;
                 padding: 30px;
                 text-align: center;
                 border-radius: 10px 10px 0 0;
-            }}
-            .content {{
+            }
+            .content {
                 background: #f9f9f9;
                 padding: 30px;
                 border: 1px solid #ddd;
-            }}
-            .button {{
+            }
+            .button {
                 display: inline-block;
                 background: #1e3a5f;
                 color: white !important;
@@ -99,16 +204,16 @@ def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
                 border-radius: 5px;
                 margin: 20px 0;
                 font-weight: bold;
-            }}
-            .footer {{
+            }
+            .footer {
                 text-align: center;
                 padding: 20px;
                 color: #666;
                 font-size: 12px;
                 border-radius: 0 0 10px 10px;
                 background: #f0f0f0;
-            }}
-            .token {{
+            }
+            .token {
                 background: #e8e8e8;
                 padding: 10px;
                 border-radius: 5px;
@@ -116,7 +221,7 @@ def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
                 word-break: break-all;
                 font-size: 12px;
                 margin: 10px 0;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -125,15 +230,15 @@ def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
             <p>Sistema de Evaluación de Desempeño</p>
         </div>
         <div class="content">
-            <h2>¡Hola {nombre}!</h2>
+            <h2>¡Hola $nombre!</h2>
             <p>Gracias por registrarte en <strong>Performia</strong>. Para completar tu registro y activar tu cuenta, por favor confirma tu dirección de correo electrónico.</p>
             
             <p style="text-align: center;">
-                <a href="{confirmation_url}" class="button">Confirmar mi correo</a>
+                <a href="$url" class="button">Confirmar mi correo</a>
             </p>
             
             <p>Si el botón no funciona, copia y pega el siguiente enlace en tu navegador:</p>
-            <div class="token">{confirmation_url}</div>
+            <div class="token">$url</div>
             
             <p><strong>Este enlace expirará en 24 horas.</strong></p>
             
@@ -145,46 +250,35 @@ def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
         </div>
     </body>
     </html>
-    """
-    
-    return send_email(email, subject, html_content)
-
+    """)
 
-def send_password_reset_email(email: str, nombre: str, token: str) -> bool:
-    """
-    Envía correo para restablecer contraseña (con enlace)
-    """
-    reset_url = f"{FRONTEND_URL}/auth/reset-password/{token}"
-    
-    subject = "Restablece tu contraseña en Performia"
-    
-    html_content = f"""
+_PASSWORD_RESET_TEMPLATE = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="UTF-8">
         <style>
-            body {{
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 line-height: 1.6;
                 color: #333;
                 max-width: 600px;
                 margin: 0 auto;
                 padding: 20px;
-            }}
-            .header {{
+            }
+            .header {
                 background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%);
                 color: white;
                 padding: 30px;
                 text-align: center;
                 border-radius: 10px 10px 0 0;
-            }}
-            .content {{
+            }
+            .content {
                 background: #f9f9f9;
                 padding: 30px;
                 border: 1px solid #ddd;
-            }}
-            .button {{
+            }
+            .button {
                 display: inline-block;
                 background: #dc3545;
                 color: white !important;
@@ -193,14 +287,14 @@ def send_password_reset_email(email: str, nombre: str, token: str) -> bool:
                 border-radius: 5px;
                 margin: 20px 0;
                 font-weight: bold;
-            }}
-            .footer {{
+            }
+            .footer {
                 text-align: center;
                 padding: 20px;
                 color: #666;
                 font-size: 12px;
                 background: #f0f0f0;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -209,11 +303,11 @@ def send_password_reset_email(email: str, nombre: str, token: str) -> bool:
             <p>Sistema de Evaluación de Desempeño</p>
         </div>
         <div class="content">
-            <h2>Hola {nombre},</h2>
+            <h2>Hola $nombre,</h2>
             <p>Recibimos una solicitud para restablecer la contraseña de tu cuenta.</p>
             
             <p style="text-align: center;">
-                <a href="{reset_url}" class="button">Restablecer Contraseña</a>
+                <a href="$url" class="button">Restablecer Contraseña</a>
             </p>
             
             <p><strong>Este enlace expirará en 1 hora.</strong></p>
@@ -225,45 +319,36 @@ def send_password_reset_email(email: str, nombre: str, token: str) -> bool:
         </div>
     </body>
     </html>
-    """
-    
-    return send_email(email, subject, html_content)
-
+    """)
 
-def send_password_reset_code_email(email: str, nombre: str, codigo: str) -> bool:
-    """
-    Envía correo con código de 6 dígitos para recuperación de contraseña
-    """
-    subject = "Código de recuperación - Performia"
-    
-    html_content = f"""
+_PASSWORD_RESET_CODE_TEMPLATE = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="UTF-8">
         <style>
-            body {{
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 line-height: 1.6;
                 color: #333;
                 max-width: 600px;
                 margin: 0 auto;
                 padding: 20px;
-            }}
-            .header {{
+            }
+            .header {
                 background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%);
                 color: white;
                 padding: 30px;
                 text-align: center;
                 border-radius: 10px 10px 0 0;
-            }}
-            .content {{
+            }
+            .content {
                 background: #f9f9f9;
                 padding: 30px;
                 border: 1px solid #ddd;
                 text-align: center;
-            }}
-            .code {{
+            }
+            .code {
                 font-size: 36px;
                 font-weight: bold;
                 letter-spacing: 10px;
@@ -274,23 +359,23 @@ def send_password_reset_code_email(email: str, nombre: str, codigo: str) -> bool
                 border-radius: 10px;
                 margin: 25px 0;
                 display: inline-block;
-            }}
-            .footer {{
+            }
+            .footer {
                 text-align: center;
                 padding: 20px;
                 color: #666;
                 font-size: 12px;
                 background: #f0f0f0;
                 border-radius: 0 0 10px 10px;
-            }}
-            .warning {{
+            }
+            .warning {
                 background: #fff3cd;
                 border: 1px solid #ffc107;
                 color: #856404;
                 padding: 15px;
                 border-radius: 5px;
                 margin: 20px 0;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -299,11 +384,11 @@ def send_password_reset_code_email(email: str, nombre: str, codigo: str) -> bool
             <p>Recuperación de Contraseña</p>
         </div>
         <div class="content">
-            <h2>Hola {nombre},</h2>
+            <h2>Hola $nombre,</h2>
             <p>Recibimos una solicitud para restablecer tu contraseña.</p>
             <p>Tu código de verificación es:</p>
             
-            <div class="code">{codigo}</div>
+            <div class="code">$codigo</div>
             
             <div class="warning">
                 <strong>⏱️ Este código expirará en 15 minutos.</strong>
@@ -319,6 +404,41 @@ def send_password_reset_code_email(email: str, nombre: str, codigo: str) -> bool
         </div>
     </body>
     </html>
+    """)
+
+
+def send_confirmation_email(email: str, nombre: str, token: str) -> bool:
+    """
+    Envía correo de confirmación de cuenta
+    """
+    confirmation_url = f"{settings.FRONTEND_URL}/auth/confirmar-correo/{token}"
+    
+    subject = "Confirma tu cuenta en Performia"
+    
+    html_content = _CONFIRMATION_TEMPLATE.substitute(nombre=nombre, url=confirmation_url)
+    
+    return send_email(email, subject, html_content)
+
+
+def send_password_reset_email(email: str, nombre: str, token: str) -> bool:
+    """
+    Envía correo para restablecer contraseña (con enlace)
     """
+    reset_url = f"{settings.FRONTEND_URL}/auth/reset-password/{token}"
+    
+    subject = "Restablece tu contraseña en Performia"
+    
+    html_content = _PASSWORD_RESET_TEMPLATE.substitute(nombre=nombre, url=reset_url)
+    
+    return send_email(email, subject, html_content)
+
+
+def send_password_reset_code_email(email: str, nombre: str, codigo: str) -> bool:
+    """
+    Envía correo con código de 6 dígitos para recuperación de contraseña
+    """
+    subject = "Código de recuperación - Performia"
+    
+    html_content = _PASSWORD_RESET_CODE_TEMPLATE.substitute(nombre=nombre, codigo=codigo)
     
     return send_email(email, subject, html_content)
\ No newline at end of file
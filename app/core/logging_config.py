@@ -0,0 +1,46 @@
+"""
+Configuración de logging de la aplicación
+Los registros se encolan desde el hilo de la petición y un QueueListener
+los escribe en consola desde un hilo aparte
+"""
+import logging
+import logging.config
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+
+def setup_logging() -> QueueListener:
+    """
+    Configura el logger "app" con un QueueHandler y arranca el listener
+    
+    Returns:
+        QueueListener en ejecución (detenerlo al apagar la aplicación)
+    """
+    logging.config.dictConfig({
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {
+            "queue": {
+                "()": QueueHandler,
+                "queue": _log_queue,
+            },
+        },
+        "loggers": {
+            "app": {
+                "handlers": ["queue"],
+                "level": "DEBUG" if settings.DEBUG else "INFO",
+                "propagate": False,
+            },
+        },
+    })
+    
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(_log_queue, console, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,41 @@
+"""
+Paginación por clave (keyset) sobre (fecha_fin, id)
+Para los listados ordenados por vencimiento: el cursor 'AAAA-MM-DD,id' es el
+último elemento de la página anterior (fecha vacía si no tiene fecha_fin)
+"""
+from datetime import date
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+
+def cursor_fecha_fin(fecha_fin: Optional[date], id_: int) -> str:
+    """Cursor 'AAAA-MM-DD,id' de un elemento"""
+    return f"{fecha_fin.isoformat() if fecha_fin else ''},{id_}"
+
+
+def leer_cursor_fecha_fin(after: str) -> Tuple[Optional[date], int]:
+    """Decodifica un cursor de cursor_fecha_fin en (fecha_fin, id)"""
+    try:
+        fecha_fin, id_ = after.split(",")
+        return (date.fromisoformat(fecha_fin) if fecha_fin else None), int(id_)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+
+def despues_del_cursor(columna_fecha_fin, columna_id, after: str):
+    """
+    Condición de los elementos posteriores al cursor en el orden
+    (fecha_fin ASC, id ASC); los que no tienen fecha_fin van primero, como
+    los ordena MySQL
+    """
+    fecha_fin, after_id = leer_cursor_fecha_fin(after)
+    if fecha_fin is None:
+        return or_(columna_fecha_fin.isnot(None), columna_id > after_id)
+    return or_(
+        columna_fecha_fin > fecha_fin,
+        and_(columna_fecha_fin == fecha_fin, columna_id > after_id)
+    )
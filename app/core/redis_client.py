@@ -0,0 +1,25 @@
+"""
+Cliente Redis compartido (asyncio)
+Para datos efímeros con expiración nativa (ej. códigos de recuperación)
+"""
+from typing import Optional
+import redis.asyncio as redis
+from app.core.config import settings
+
+_redis: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Obtiene el cliente Redis del proceso (pool de conexiones compartido)"""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    """Cierra el pool de conexiones de Redis"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
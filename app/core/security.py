@@ -1,24 +1,105 @@
 """
 Funciones de seguridad: hashing, JWT, etc.
 """
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from app.core.config import settings
 
-# Contexto para hashing de passwords con bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashing de passwords: argon2id con el perfil de OWASP para hashes nuevos;
+# los hashes bcrypt antiguos ($2a$/$2b$) se verifican y migran en el login
+pwd_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1, hash_len=32)
+
+BCRYPT_PREFIX = "$2"
+
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    return hashed_password.startswith(BCRYPT_PREFIX)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica que una contraseña coincida con su hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if _is_bcrypt_hash(hashed_password):
+        # bcrypt solo usa los primeros 72 bytes (igual que passlib)
+        return bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode())
+    try:
+        return pwd_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica una contraseña y, si su hash es bcrypt o usa parámetros argon2
+    antiguos, devuelve también el nuevo hash para reemplazarlo
+    
+    Returns:
+        (coincide, nuevo_hash o None)
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    
+    if _is_bcrypt_hash(hashed_password) or pwd_hasher.check_needs_rehash(hashed_password):
+        return True, get_password_hash(plain_password)
+    
+    return True, None
 
 
 def get_password_hash(password: str) -> str:
     """Genera el hash de una contraseña"""
-    return pwd_context.hash(password)
+    return pwd_hasher.hash(password)
+
+
+# Pool dedicado para el hashing: argon2-cffi libera el GIL, así que los hilos
+# escalan a todos los núcleos. Limitarlo a cpu_count acota también la memoria
+# (19 MiB por hash) y evita que una ráfaga de logins agote el threadpool de
+# FastAPI mientras el resto de endpoints esperan
+_password_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1,
+    thread_name_prefix="password-hash"
+)
+
+
+async def _run_password_hashing(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, func, *args)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash en el pool de hashing (para endpoints async)"""
+    return await _run_password_hashing(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password en el pool de hashing (para endpoints async)"""
+    return await _run_password_hashing(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password en el pool de hashing (para endpoints async)"""
+    return await _run_password_hashing(verify_and_update_password, plain_password, hashed_password)
+
+
+# Clave para los códigos de recuperación (derivada una vez de SECRET_KEY;
+# blake2b admite claves de hasta 64 bytes)
+_RESET_CODE_KEY = hashlib.blake2b(settings.SECRET_KEY.encode(), digest_size=32).digest()
+
+
+def hash_reset_code(codigo: str) -> str:
+    """Hash con clave (blake2b) de un código de recuperación, en hex"""
+    return hashlib.blake2b(codigo.encode(), key=_RESET_CODE_KEY, digest_size=16).hexdigest()
+
+
+def hash_token(token: str) -> bytes:
+    """Hash sha256 de un token opaco (se guarda el hash, nunca el token)"""
+    return hashlib.sha256(token.encode()).digest()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -0,0 +1,93 @@
+"""
+Cola de tareas asíncronas con Celery
+Los correos se envían desde workers dedicados a la cola "email_queue":
+
+    celery -A app.core.tasks worker -Q email_queue --concurrency=2
+
+Dos procesos bastan: el envío es E/S contra el servidor SMTP y cada proceso
+reutiliza su conexión; más concurrencia solo provoca throttling del proveedor
+"""
+import logging
+import smtplib
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from fastapi import BackgroundTasks
+from app.core.config import settings
+from app.core.email import (
+    send_confirmation_email,
+    send_password_reset_code_email,
+    get_smtp_connection,
+    close_smtp_connections
+)
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE = "email_queue"
+
+celery_app = Celery("performia", broker=settings.CELERY_BROKER_URL)
+celery_app.conf.task_routes = {"app.core.tasks.*": {"queue": EMAIL_QUEUE}}
+
+
+@worker_process_init.connect
+def _on_worker_init(**kwargs):
+    """Abre la conexión SMTP del worker antes de recibir la primera tarea"""
+    try:
+        get_smtp_connection()
+    except Exception:
+        logger.warning("No se pudo precalentar la conexión SMTP", exc_info=True)
+
+
+@worker_process_shutdown.connect
+def _on_worker_shutdown(**kwargs):
+    """Cierra las conexiones SMTP reutilizadas del worker"""
+    close_smtp_connections()
+
+
+@celery_app.task(bind=True, autoretry_for=(smtplib.SMTPException,), retry_backoff=True, max_retries=5, queue=EMAIL_QUEUE)
+def send_confirmation_email_task(self, email: str, nombre: str, token: str) -> None:
+    """Tarea: envía el correo de confirmación de cuenta"""
+    if not send_confirmation_email(email=email, nombre=nombre, token=token):
+        raise smtplib.SMTPException(f"No se pudo enviar el correo de confirmación a {email}")
+
+
+@celery_app.task(bind=True, autoretry_for=(smtplib.SMTPException,), retry_backoff=True, max_retries=5, queue=EMAIL_QUEUE)
+def send_password_reset_code_email_task(self, email: str, nombre: str, codigo: str) -> None:
+    """Tarea: envía el código de recuperación de contraseña"""
+    if not send_password_reset_code_email(email=email, nombre=nombre, codigo=codigo):
+        raise smtplib.SMTPException(f"No se pudo enviar el código de recuperación a {email}")
+
+
+# ============================================
+# ENCOLADO (con fallback a BackgroundTasks en DEBUG)
+# ============================================
+
+def enqueue_confirmation_email(
+    background_tasks: BackgroundTasks,
+    email: str,
+    nombre: str,
+    token: str
+) -> None:
+    """
+    Encola el correo de confirmación
+    En DEBUG se envía con BackgroundTasks para no requerir broker ni worker
+    """
+    if settings.DEBUG:
+        background_tasks.add_task(send_confirmation_email, email=email, nombre=nombre, token=token)
+    else:
+        send_confirmation_email_task.delay(email=email, nombre=nombre, token=token)
+
+
+def enqueue_password_reset_code_email(
+    background_tasks: BackgroundTasks,
+    email: str,
+    nombre: str,
+    codigo: str
+) -> None:
+    """
+    Encola el correo con el código de recuperación
+    En DEBUG se envía con BackgroundTasks para no requerir broker ni worker
+    """
+    if settings.DEBUG:
+        background_tasks.add_task(send_password_reset_code_email, email=email, nombre=nombre, codigo=codigo)
+    else:
+        send_password_reset_code_email_task.delay(email=email, nombre=nombre, codigo=codigo)
@@ -2,29 +2,113 @@
 Archivo principal de la aplicación FastAPI
 Performia - Sistema de Evaluación de Desempeño
 """
+import asyncio
+import importlib
+import logging
+import pkgutil
+import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
 from app.core.database import Base, engine
+from app.core.email import close_smtp_connections
+from app.core.redis_client import close_redis
+from app.core.security import get_password_hash
+from app.core.logging_config import setup_logging
+from app.modules.auth.services import flush_ultimo_acceso
+from app import modules
+
+logger = logging.getLogger(__name__)
+
+# Routers a registrar: (módulo, atributo del router, opciones extra)
+ROUTERS = [
+    ("auth", "router", {}),
+    ("users", "router", {}),
+    ("formularios", "router", {}),
+    ("evaluaciones", "router", {}),
+    ("objetivos", "router", {}),
+    ("retroalimentaciones", "router", {}),
+    ("reportes", "router_notificaciones", {"tags": ["Notificaciones"]}),
+    ("reportes", "router_reportes", {"tags": ["Reportes"]}),
+]
+
+
+def _register_models() -> None:
+    """
+    Importa TODOS los modelos para que SQLAlchemy los registre
+    Necesario aunque un módulo esté deshabilitado: las relaciones se
+    resuelven por nombre entre módulos
+    """
+    for modulo in pkgutil.iter_modules(modules.__path__):
+        nombre = f"app.modules.{modulo.name}.models"
+        try:
+            importlib.import_module(nombre)
+        except ModuleNotFoundError as e:
+            # Módulos sin modelos propios (ej. auth)
+            if e.name != nombre:
+                raise
+
+
+def _warm_up() -> None:
+    """
+    Precalienta recursos para que la primera petición no pague su costo:
+    una conexión del pool de la BD y la inicialización del hasher de contraseñas
+    """
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        logger.warning("No se pudo precalentar el pool de la base de datos", exc_info=True)
+    
+    try:
+        get_password_hash("warmup")
+    except Exception:
+        logger.warning("No se pudo precalentar el backend de hashing", exc_info=True)
+
+
+def _include_routers(app: FastAPI) -> None:
+    """Registra los routers de los módulos habilitados"""
+    for modulo, nombre, opciones in ROUTERS:
+        if modulo in settings.disabled_modules:
+            continue
+        routers = importlib.import_module(f"app.modules.{modulo}.routers")
+        app.include_router(getattr(routers, nombre), prefix="/api", **opciones)
+
+
+async def _flush_ultimo_acceso_periodicamente() -> None:
+    """Escribe en lote los últimos accesos de login cada N segundos"""
+    while True:
+        await asyncio.sleep(settings.ULTIMO_ACCESO_FLUSH_SECONDS)
+        await run_in_threadpool(flush_ultimo_acceso)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida de la aplicación (inicio y apagado)"""
+    log_listener = setup_logging()
+    _register_models()
+    _warm_up()
+    logger.info("Iniciando %s v%s", settings.APP_NAME, settings.APP_VERSION)
+    logger.info("Base de datos: %s | Debug mode: %s", settings.DB_NAME, settings.DEBUG)
+    logger.info("Modelos registrados correctamente")
+    flush_task = asyncio.create_task(_flush_ultimo_acceso_periodicamente())
+    
+    yield
+    
+    # Escribir los últimos accesos pendientes antes de salir
+    flush_task.cancel()
+    await run_in_threadpool(flush_ultimo_acceso)
+    
+    # Cerrar las conexiones SMTP reutilizadas y el pool de Redis
+    close_smtp_connections()
+    await close_redis()
+    log_listener.stop()
 
-# ⚠️ IMPORTANTE: Importar TODOS los modelos para que SQLAlchemy los registre
-from app.modules.users.models import Usuario, Rol
-from app.modules.formularios.models import Formulario, Pregunta
-from app.modules.evaluaciones.models import Evaluacion, Resultado
-from app.modules.objetivos.models import Objetivo
-from app.modules.retroalimentaciones.models import Retroalimentacion
-from app.modules.reportes.models import Reporte, Notificacion, LogAuditoria
-
-# Importar todos los routers
-from app.modules.auth.routers import router as auth_router
-from app.modules.users.routers import router as users_router
-from app.modules.formularios.routers import router as formularios_router
-from app.modules.evaluaciones.routers import router as evaluaciones_router
-from app.modules.objetivos.routers import router as objetivos_router
-from app.modules.retroalimentaciones.routers import router as retroalimentaciones_router
-
-# ✅ CAMBIO: Importar los DOS routers de reportes
-from app.modules.reportes import routers as reportes_routers
 
 # Crear aplicación FastAPI (UNA SOLA VEZ)
 app = FastAPI(
@@ -32,58 +116,26 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="API REST para el sistema de evaluación de desempeño Performia",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:4200",
-        "http://127.0.0.1:4200",
-        "http://54.221.154.8:4200",
-        "http://54.221.154.8",
-    ],
+    allow_origins=settings.cors_origins,  # Desde ALLOWED_ORIGINS en .env
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor de paginación de los listados
 )
 
+# Comprimir respuestas grandes (listados de evaluaciones, reportes)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-# Evento de inicio
-@app.on_event("startup")
-def on_startup():
-    """Evento que se ejecuta al iniciar la aplicación"""
-    print("\n" + "="*60)
-    print(f"🚀 Iniciando {settings.APP_NAME} v{settings.APP_VERSION}")
-    print("="*60)
-    print(f"📊 Base de datos: {settings.DB_NAME}")
-    print(f"🔑 Debug mode: {settings.DEBUG}")
-    print("="*60)
-    print("✅ Modelos registrados correctamente")
-    print("="*60 + "\n")
-
-
-# Incluir todos los routers
-app.include_router(auth_router, prefix="/api")
-app.include_router(users_router, prefix="/api")
-app.include_router(formularios_router, prefix="/api")
-app.include_router(evaluaciones_router, prefix="/api")
-app.include_router(objetivos_router, prefix="/api")
-app.include_router(retroalimentaciones_router, prefix="/api")
-
-# ✅ CAMBIO: Registrar los DOS routers de reportes (notificaciones y reportes)
-app.include_router(
-    reportes_routers.router_notificaciones,
-    prefix="/api",
-    tags=["Notificaciones"]
-)
-
-app.include_router(
-    reportes_routers.router_reportes,
-    prefix="/api",
-    tags=["Reportes"]
-)
+# Incluir los routers de los módulos habilitados
+_include_routers(app)
 
 
 # Endpoint raíz
@@ -114,20 +166,18 @@ def health_check():
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Manejador global de excepciones"""
-    import traceback
-    error_trace = traceback.format_exc()
-    print(f"\n❌ Error no manejado:")
-    print(error_trace)
+    logger.error("Error no manejado", exc_info=exc)
     
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
-        status_code=500,
-        content={
-            "detail": str(exc),
-            "type": type(exc).__name__,
-            "trace": error_trace if settings.DEBUG else None
-        }
-    )
+    content = {
+        "detail": str(exc),
+        "type": type(exc).__name__
+    }
+    
+    # Solo formatear el traceback cuando se devuelve al cliente
+    if settings.DEBUG:
+        content["trace"] = "".join(traceback.format_exception(exc))
+    
+    return ORJSONResponse(status_code=500, content=content)
 
 
 if __name__ == "__main__":
@@ -136,5 +186,8 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        workers=None if settings.DEBUG else settings.WORKERS,
+        loop="auto",        # uvloop si está instalado (no disponible en Windows)
+        http="httptools"
     )
@@ -2,16 +2,145 @@
 Dependencias de autenticación
 Valida tokens JWT y obtiene el usuario actual
 """
+import hashlib
+import threading
+import time
+from cachetools import TLRUCache, TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, object_session
 from typing import Optional
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
 from app.core.security import decode_access_token
-from app.modules.users.models import Usuario
+from app.modules.users.models import Usuario, Rol
 
 # OAuth2 scheme para extraer el token del header Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Igual pero sin exigir el token (ej. logout)
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+
+# ============================================
+# CACHÉ DE TOKENS VERIFICADOS
+# ============================================
+
+def _token_ttu(key: bytes, payload: dict, now: float) -> float:
+    """Vida de una entrada: TTL del caché, sin pasar del 'exp' del token"""
+    restante = payload.get("exp", 0) - time.time()
+    return now + min(settings.USER_CACHE_TTL_SECONDS, restante)
+
+
+# Payloads de JWT ya verificados por hash del token (nunca el token en claro)
+_tokens_cache: TLRUCache = TLRUCache(maxsize=10000, ttu=_token_ttu)
+_tokens_cache_lock = threading.Lock()
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _decode_token_cached(token: str) -> Optional[dict]:
+    """Decodifica y verifica el JWT, o reutiliza una verificación reciente"""
+    key = _token_key(token)
+    with _tokens_cache_lock:
+        payload = _tokens_cache.get(key)
+    if payload is not None:
+        return payload
+    
+    payload = decode_access_token(token)
+    if payload is not None:
+        with _tokens_cache_lock:
+            _tokens_cache[key] = payload
+    return payload
+
+
+def invalidate_token(token: str) -> None:
+    """Quita un token del caché de verificación (ej. en logout)"""
+    with _tokens_cache_lock:
+        _tokens_cache.pop(_token_key(token), None)
+
+
+# ============================================
+# CACHÉ DE USUARIOS AUTENTICADOS
+# ============================================
+
+# Usuarios desacoplados (con su rol cargado) por id; se adjuntan a la
+# sesión de cada petición con merge(load=False), sin consultar la BD
+_usuarios_cache: TTLCache = TTLCache(maxsize=10000, ttl=settings.USER_CACHE_TTL_SECONDS)
+_usuarios_cache_lock = threading.Lock()
+
+
+def invalidate_user_cache(id_usuario: Optional[int] = None) -> None:
+    """Invalida un usuario del caché (o todo el caché si no se indica id)"""
+    with _usuarios_cache_lock:
+        if id_usuario is None:
+            _usuarios_cache.clear()
+        else:
+            _usuarios_cache.pop(id_usuario, None)
+
+
+# Claves en Session.info de los cambios pendientes de confirmar: el caché se
+# invalida en after_commit, no en el flush, para que una petición concurrente
+# no vuelva a cachear la fila anterior al commit
+_USUARIOS_CAMBIADOS = "usuarios_cambiados"
+_ROLES_CAMBIADOS = "roles_cambiados"
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _on_usuario_changed(mapper, connection, target):
+    """Cualquier cambio de un usuario (password, estado, correo...) lo invalida"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_USUARIOS_CAMBIADOS, set()).add(target.id_usuario)
+
+
+@event.listens_for(Rol, "after_update")
+@event.listens_for(Rol, "after_delete")
+def _on_rol_changed(mapper, connection, target):
+    """Los usuarios cacheados llevan su rol: se invalida todo"""
+    session = object_session(target)
+    if session is not None:
+        session.info[_ROLES_CAMBIADOS] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_usuarios_confirmados(session):
+    usuarios = session.info.pop(_USUARIOS_CAMBIADOS, ())
+    if session.info.pop(_ROLES_CAMBIADOS, False):
+        invalidate_user_cache()
+        return
+    for id_usuario in usuarios:
+        invalidate_user_cache(id_usuario)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_usuarios_cambiados(session):
+    session.info.pop(_USUARIOS_CAMBIADOS, None)
+    session.info.pop(_ROLES_CAMBIADOS, None)
+
+
+def _get_usuario_cached(db: Session, user_id: int) -> Optional[Usuario]:
+    """
+    Obtiene el usuario del caché o de la BD y lo adjunta a la sesión actual
+    """
+    with _usuarios_cache_lock:
+        cached = _usuarios_cache.get(user_id)
+    
+    if cached is None:
+        # Cargar en una sesión propia para que la copia cacheada no quede
+        # ligada (ni expirada por commits) a la sesión de la petición
+        with SessionLocal() as cache_db:
+            cached = cache_db.get(Usuario, user_id, options=[joinedload(Usuario.rol)])
+            if cached is None:
+                return None
+            cache_db.expunge_all()
+        with _usuarios_cache_lock:
+            _usuarios_cache[user_id] = cached
+    
+    return db.merge(cached, load=False)
 
 
 def get_current_user(
@@ -37,8 +166,8 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Decodificar token
-    payload = decode_access_token(token)
+    # Decodificar token (o reutilizar la verificación cacheada)
+    payload = _decode_token_cached(token)
     if payload is None:
         raise credentials_exception
     
@@ -47,8 +176,8 @@ def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    # Buscar usuario en BD
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == int(user_id)).first()
+    # Buscar usuario (caché de corta duración o BD con su rol en la misma consulta)
+    usuario = _get_usuario_cached(db, int(user_id))
     if usuario is None:
         raise credentials_exception
     
@@ -80,11 +209,15 @@ def require_role(*allowed_roles: str):
         def admin_only(user: Usuario = Depends(require_role("Administrador"))):
             ...
     """
+    # Se calculan una sola vez al declarar la dependencia
+    allowed = frozenset(allowed_roles)
+    detail = f"Se requiere uno de los siguientes roles: {', '.join(allowed_roles)}"
+    
     def role_checker(current_user: Usuario = Depends(get_current_user)) -> Usuario:
-        if current_user.rol.nombre_rol not in allowed_roles:
+        if current_user.rol.nombre_rol not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Se requiere uno de los siguientes roles: {', '.join(allowed_roles)}"
+                detail=detail
             )
         return current_user
     
@@ -2,6 +2,7 @@
 Rutas de autenticación
 """
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.modules.auth.schemas import (
@@ -13,36 +14,43 @@ from app.modules.auth.schemas import (
     ReenviarConfirmacionRequest,
     PasswordResetRequest,
     VerifyResetCodeRequest,
-    PasswordResetConfirm
+    PasswordResetConfirm,
+    UsuarioActualResponse,
+    ValidarTokenResponse
 )
 from app.modules.auth.services import (
     authenticate_user, 
     create_user_token,
-    check_email_exists,
     create_user,
     confirm_user_email,
-    regenerate_confirmation_token
+    regenerate_confirmation_token,
+    actualizar_password,
+    actualizar_password_por_correo,
+    get_destinatario_reset,
+    guardar_codigo_reset,
+    codigo_reset_valido,
+    consumir_codigo_reset
 )
-from app.modules.auth.dependencies import get_current_user
+from app.modules.auth.dependencies import get_current_user, oauth2_scheme_optional, invalidate_token
 from app.modules.users.models import Usuario
 from app.modules.users.schemas import CambiarPasswordRequest
-from app.core.security import verify_password, get_password_hash
-from app.core.email import send_confirmation_email, send_password_reset_code_email
-from datetime import datetime
-import random
+from app.core.security import verify_password_async, get_password_hash_async
+from app.core.tasks import enqueue_confirmation_email, enqueue_password_reset_code_email
+from typing import Optional
+import secrets
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
     credentials: LoginRequest,
     db: Session = Depends(get_db)
 ):
     """
     Endpoint de login
     """
-    usuario = authenticate_user(db, credentials.correo, credentials.password)
+    usuario = await authenticate_user(db, credentials.correo, credentials.password)
     
     if not usuario:
         raise HTTPException(
@@ -79,7 +87,7 @@ def login(
 
 
 @router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED)
-def register(
+async def register(
     user_data: RegisterRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -87,28 +95,32 @@ def register(
     """
     Registra un nuevo usuario
     """
-    # Verificar si el email ya existe
-    if check_email_exists(db, user_data.email):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El correo electrónico ya está registrado"
-        )
+    password_hash = await get_password_hash_async(user_data.password)
     
-    # Crear usuario
+    # Crear usuario (el INSERT falla por UNIQUE si el email ya existe)
     try:
-        nuevo_usuario = create_user(db, user_data)
+        creado = await run_in_threadpool(create_user, db, user_data, password_hash)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al crear el usuario: {str(e)}"
         )
     
-    # Enviar correo de confirmación en segundo plano
-    background_tasks.add_task(
-        send_confirmation_email,
+    if not creado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El correo electrónico ya está registrado"
+        )
+    
+    nuevo_usuario, token_confirmacion = creado
+    
+    # Encolar correo de confirmación (publicar en el broker es E/S bloqueante)
+    await run_in_threadpool(
+        enqueue_confirmation_email,
+        background_tasks,
         email=nuevo_usuario.correo,
         nombre=nuevo_usuario.nombre,
-        token=nuevo_usuario.token_confirmacion
+        token=token_confirmacion
     )
     
     return RegisterResponse(
@@ -182,12 +194,12 @@ def reenviar_confirmacion(
     if usuario.correo_confirmado:
         return {"message": "Este correo ya está confirmado. Puedes iniciar sesión."}
     
-    nuevo_token = regenerate_confirmation_token(db, request.email)
+    nuevo_token = regenerate_confirmation_token(db, usuario)
     
     if nuevo_token:
-        # Enviar correo
-        background_tasks.add_task(
-            send_confirmation_email,
+        # Encolar correo
+        enqueue_confirmation_email(
+            background_tasks,
             email=usuario.correo,
             nombre=usuario.nombre,
             token=nuevo_token
@@ -201,31 +213,29 @@ def reenviar_confirmacion(
 # ============================================
 
 @router.post("/request-password-reset")
-def request_password_reset(
+async def request_password_reset(
     request: PasswordResetRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Solicita reset de contraseña - envía código de 6 dígitos por email
+    El código se guarda en Redis con TTL (expira solo, sin tocar la BD)
     """
-    usuario = db.query(Usuario).filter(Usuario.correo == request.email).first()
+    usuario = await run_in_threadpool(get_destinatario_reset, db, request.email)
     
     # Siempre responder igual para no revelar si el email existe
     if not usuario:
         return {"message": "Si el correo existe, recibirás un código de recuperación."}
     
     # Generar código de 6 dígitos
-    codigo = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-    
-    # Guardar código en token_confirmacion (temporal)
-    usuario.token_confirmacion = codigo
-    usuario.fecha_modificacion = datetime.utcnow()
-    db.commit()
+    codigo = f"{secrets.randbelow(1_000_000):06d}"
+    await guardar_codigo_reset(usuario.correo, codigo)
     
-    # Enviar email con código
-    background_tasks.add_task(
-        send_password_reset_code_email,
+    # Encolar email con código
+    await run_in_threadpool(
+        enqueue_password_reset_code_email,
+        background_tasks,
         email=usuario.correo,
         nombre=usuario.nombre,
         codigo=codigo
@@ -235,19 +245,11 @@ def request_password_reset(
 
 
 @router.post("/verify-reset-token")
-def verify_reset_token(
-    request: VerifyResetCodeRequest,
-    db: Session = Depends(get_db)
-):
+async def verify_reset_token(request: VerifyResetCodeRequest):
     """
     Verifica el código de reset
     """
-    usuario = db.query(Usuario).filter(
-        Usuario.correo == request.email,
-        Usuario.token_confirmacion == request.codigo
-    ).first()
-    
-    if not usuario:
+    if not await codigo_reset_valido(request.email, request.codigo):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Código inválido o expirado"
@@ -257,29 +259,31 @@ def verify_reset_token(
 
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     request: PasswordResetConfirm,
     db: Session = Depends(get_db)
 ):
     """
     Resetea la contraseña con el código
     """
-    usuario = db.query(Usuario).filter(
-        Usuario.correo == request.email,
-        Usuario.token_confirmacion == request.codigo
-    ).first()
-    
-    if not usuario:
+    # Consumir el código (un solo uso) antes de hashear la contraseña
+    if not await consumir_codigo_reset(request.email, request.codigo):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Código inválido o expirado"
         )
     
-    # Actualizar contraseña
-    usuario.password_hash = get_password_hash(request.nueva_password)
-    usuario.token_confirmacion = None
-    usuario.fecha_modificacion = datetime.utcnow()
-    db.commit()
+    password_hash = await get_password_hash_async(request.nueva_password)
+    
+    actualizado = await run_in_threadpool(
+        actualizar_password_por_correo, db, request.email, password_hash
+    )
+    
+    if not actualizado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Código inválido o expirado"
+        )
     
     return {"message": "Contraseña actualizada exitosamente"}
 
@@ -288,42 +292,28 @@ def reset_password(
 # ENDPOINTS DE USUARIO ACTUAL
 # ============================================
 
-@router.get("/me")
+@router.get("/me", response_model=UsuarioActualResponse)
 def get_current_user_info(
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Obtiene la información del usuario actual
     """
-    return {
-        "id_usuario": current_user.id_usuario,
-        "nombre": current_user.nombre,
-        "apellido": current_user.apellido,
-        "correo": current_user.correo,
-        "rol": current_user.rol.nombre_rol,
-        "area": current_user.area,
-        "cargo": current_user.cargo,
-        "estado": current_user.estado
-    }
+    return UsuarioActualResponse.model_validate(current_user)
 
 
-@router.get("/validar-token")
+@router.get("/validar-token", response_model=ValidarTokenResponse)
 def validar_token(
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Valida si un token es válido
     """
-    return {
-        "valid": True,
-        "id_usuario": current_user.id_usuario,
-        "correo": current_user.correo,
-        "rol": current_user.rol.nombre_rol
-    }
+    return ValidarTokenResponse.model_validate(current_user)
 
 
 @router.post("/cambiar-password")
-def cambiar_password(
+async def cambiar_password(
     request: CambiarPasswordRequest,
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -331,7 +321,7 @@ def cambiar_password(
     """
     Cambia la contraseña del usuario actual
     """
-    if not verify_password(request.password_actual, current_user.password_hash):
+    if not await verify_password_async(request.password_actual, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="La contraseña actual es incorrecta"
@@ -343,16 +333,17 @@ def cambiar_password(
             detail="Las contraseñas nuevas no coinciden"
         )
     
-    current_user.password_hash = get_password_hash(request.password_nueva)
-    current_user.fecha_modificacion = datetime.utcnow()
-    db.commit()
+    password_hash = await get_password_hash_async(request.password_nueva)
+    await run_in_threadpool(actualizar_password, db, current_user, password_hash)
     
     return {"message": "Contraseña cambiada exitosamente"}
 
 
 @router.post("/logout")
-def logout():
+def logout(token: Optional[str] = Depends(oauth2_scheme_optional)):
     """
     Logout
     """
+    if token:
+        invalidate_token(token)
     return {"message": "Sesión cerrada exitosamente"}
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Schemas para autenticación
 """
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, AliasPath
 from typing import Optional
 
 
@@ -74,4 +74,32 @@ class PasswordResetConfirm(BaseModel):
     """Schema para confirmar reset con código"""
     email: EmailStr
     codigo: str
-    nueva_password: str
\ No newline at end of file
+    nueva_password: str
+
+
+# ============================================
+# SCHEMAS DE USUARIO ACTUAL
+# ============================================
+
+class ValidarTokenResponse(BaseModel):
+    """Schema de respuesta de validación de token"""
+    valid: bool = True
+    id_usuario: int
+    correo: str
+    rol: str = Field(validation_alias=AliasPath("rol", "nombre_rol"))
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UsuarioActualResponse(BaseModel):
+    """Schema de respuesta con la información del usuario actual"""
+    id_usuario: int
+    nombre: str
+    apellido: str
+    correo: str
+    rol: str = Field(validation_alias=AliasPath("rol", "nombre_rol"))
+    area: Optional[str] = None
+    cargo: Optional[str] = None
+    estado: str
+    
+    model_config = ConfigDict(from_attributes=True)
@@ -2,35 +2,146 @@
 Servicios de autenticación
 Lógica de negocio para login, registro y manejo de sesiones
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, case, select, update
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import hashlib
+import hmac
+import logging
 import secrets
+import threading
 
 from app.modules.users.models import Usuario
-from app.core.security import verify_password, create_access_token, get_password_hash
+from app.core.security import verify_and_update_password_async, create_access_token, hash_token, hash_reset_code
 from app.modules.auth.schemas import RegisterRequest
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis
+from app.core.config import settings
+from app.modules.auth.dependencies import invalidate_user_cache
 
+logger = logging.getLogger(__name__)
 
-def authenticate_user(db: Session, correo: str, password: str) -> Usuario | None:
+# Consultas de las rutas más frecuentes, construidas una sola vez (en el primer
+# uso, cuando ya están registrados todos los modelos). Los valores van como
+# bindparam, así la clave de la caché de SQL compilado de SQLAlchemy es siempre
+# la misma y cada llamada no rearma el árbol de la consulta
+
+@lru_cache(maxsize=None)
+def _select_usuario_login():
+    return select(Usuario)\
+        .options(joinedload(Usuario.rol))\
+        .where(Usuario.correo == bindparam("correo"))\
+        .limit(1)
+
+
+@lru_cache(maxsize=None)
+def _select_destinatario_reset():
+    return select(Usuario.correo, Usuario.nombre)\
+        .where(Usuario.correo == bindparam("correo"))\
+        .limit(1)
+
+
+@lru_cache(maxsize=None)
+def _select_usuario_por_token():
+    return select(Usuario.id_usuario, Usuario.correo)\
+        .where(Usuario.token_confirmacion_hash == bindparam("token_hash"))\
+        .limit(1)
+
+
+# Último acceso pendiente de escribir por usuario (write-behind)
+_ultimo_acceso_pendiente: Dict[int, datetime] = {}
+_ultimo_acceso_lock = threading.Lock()
+
+
+def get_usuario_para_login(db: Session, correo: str) -> Optional[Usuario]:
+    """Busca un usuario por correo con su rol cargado"""
+    return db.execute(_select_usuario_login(), {"correo": correo}).scalars().first()
+
+
+def actualizar_password(db: Session, usuario: Usuario, password_hash: str) -> None:
+    """Guarda un nuevo hash de contraseña"""
+    usuario.password_hash = password_hash
+    db.commit()
+
+
+def _guardar_hash_migrado(db: Session, usuario: Usuario, password_hash: str) -> Usuario:
+    """Guarda el hash migrado y recarga el usuario con su rol en este hilo"""
+    correo = usuario.correo
+    usuario.password_hash = password_hash
+    db.commit()
+    return get_usuario_para_login(db, correo)
+
+
+async def authenticate_user(db: Session, correo: str, password: str) -> Usuario | None:
     """
     Autentica un usuario verificando email y contraseña
+    Las consultas van al threadpool y el hashing a su pool dedicado
     """
-    usuario = db.query(Usuario).filter(Usuario.correo == correo).first()
+    usuario = await run_in_threadpool(get_usuario_para_login, db, correo)
     
     if not usuario:
         return None
     
-    if not verify_password(password, usuario.password_hash):
+    valido, nuevo_hash = await verify_and_update_password_async(password, usuario.password_hash)
+    if not valido:
         return None
     
-    # Actualizar último acceso
-    usuario.ultimo_acceso = datetime.utcnow()
-    db.commit()
+    # Migrar de forma transparente hashes bcrypt antiguos a argon2
+    if nuevo_hash:
+        usuario = await run_in_threadpool(_guardar_hash_migrado, db, usuario, nuevo_hash)
+    
+    # Registrar último acceso (se escribe en lote, sin commit por login)
+    registrar_ultimo_acceso(usuario.id_usuario)
     
     return usuario
 
 
+def registrar_ultimo_acceso(id_usuario: int) -> None:
+    """Encola la actualización de ultimo_acceso de un usuario"""
+    with _ultimo_acceso_lock:
+        _ultimo_acceso_pendiente[id_usuario] = datetime.utcnow()
+
+
+def flush_ultimo_acceso() -> int:
+    """
+    Escribe los últimos accesos pendientes en un solo UPDATE por lotes
+    
+    Returns:
+        Cantidad de usuarios actualizados
+    """
+    global _ultimo_acceso_pendiente
+    with _ultimo_acceso_lock:
+        pendientes, _ultimo_acceso_pendiente = _ultimo_acceso_pendiente, {}
+    
+    if not pendientes:
+        return 0
+    
+    try:
+        with SessionLocal() as db:
+            # Un único UPDATE ... SET ultimo_acceso = CASE id_usuario WHEN ... END
+            # (executemany con PyMySQL sería una sentencia por usuario)
+            db.execute(
+                update(Usuario)
+                .where(Usuario.id_usuario.in_(pendientes.keys()))
+                .values(ultimo_acceso=case(pendientes, value=Usuario.id_usuario))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+    except Exception:
+        logger.exception("Error guardando último acceso de %d usuarios", len(pendientes))
+        # Reintentar en el siguiente ciclo sin pisar accesos más recientes
+        with _ultimo_acceso_lock:
+            for id_usuario, fecha in pendientes.items():
+                _ultimo_acceso_pendiente.setdefault(id_usuario, fecha)
+        return 0
+    
+    return len(pendientes)
+
+
 def create_user_token(usuario: Usuario) -> str:
     """
     Crea un token JWT para un usuario
@@ -50,21 +161,27 @@ def create_user_token(usuario: Usuario) -> str:
 # SERVICIOS DE REGISTRO
 # ============================================
 
-def check_email_exists(db: Session, email: str) -> bool:
+def _es_correo_duplicado(error: IntegrityError) -> bool:
     """
-    Verifica si un email ya está registrado
+    El error es la violación de la restricción UNIQUE de correo
+    MySQL: (1062, "Duplicate entry '...' for key 'usuarios.correo'") (o key 'correo')
+    SQLite: "UNIQUE constraint failed: usuarios.correo"
     """
-    usuario = db.query(Usuario).filter(Usuario.correo == email).first()
-    return usuario is not None
+    args = getattr(error.orig, "args", ())
+    if args and args[0] == 1062:
+        clave = str(args[-1]).rsplit(" for key ", 1)[-1].strip("'")
+        return clave.rsplit(".", 1)[-1] in ("correo", "ix_usuarios_correo")
+    return str(error.orig) == "UNIQUE constraint failed: usuarios.correo"
 
 
-def create_user(db: Session, user_data: RegisterRequest) -> Usuario:
+def create_user(db: Session, user_data: RegisterRequest, password_hash: str) -> Optional[Tuple[Usuario, str]]:
     """
     Crea un nuevo usuario en la base de datos
+    El hash de la contraseña se calcula antes, en el pool de hashing
+    Retorna (usuario, token de confirmación en claro) o None si el correo
+    ya está registrado (restricción UNIQUE de correo); cualquier otro error de
+    integridad (p. ej. un id_rol inexistente) se propaga
     """
-    # Hashear contraseña
-    password_hash = get_password_hash(user_data.password)
-    
     # Generar token de confirmación
     token_confirmacion = secrets.token_urlsafe(32)
     
@@ -79,56 +196,151 @@ def create_user(db: Session, user_data: RegisterRequest) -> Usuario:
         area=user_data.area,              # área como texto
         id_rol=user_data.id_rol,
         estado="Activo",                  # Activo directamente (o "Pendiente" si usas confirmación)
-        token_confirmacion=token_confirmacion,
+        token_confirmacion_hash=hash_token(token_confirmacion),
         correo_confirmado=False,
         fecha_creacion=datetime.utcnow(),
         fecha_ingreso=datetime.utcnow().date()
     )
     
     db.add(nuevo_usuario)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _es_correo_duplicado(e):
+            return None
+        raise
     db.refresh(nuevo_usuario)
     
-    return nuevo_usuario
+    return nuevo_usuario, token_confirmacion
+
+
+# ============================================
+# CÓDIGOS DE RECUPERACIÓN (Redis con TTL)
+# ============================================
+
+# Borra la clave solo si aún guarda el hash leído (otra petición pudo
+# consumirla o un nuevo código reemplazarla entre la lectura y el borrado)
+_BORRAR_SI_IGUAL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _reset_code_key(email: str) -> str:
+    """Clave del código de un correo (hash del correo, nunca en claro)"""
+    email_hash = hashlib.blake2b(email.lower().encode(), digest_size=16).hexdigest()
+    return f"pwreset:{email_hash}"
+
+
+async def _hash_codigo_si_valido(email: str, codigo: str) -> Optional[str]:
+    """Hash guardado para el correo si coincide con el del código recibido"""
+    guardado = await get_redis().get(_reset_code_key(email))
+    if guardado is None or not hmac.compare_digest(guardado, hash_reset_code(codigo)):
+        return None
+    return guardado
+
+
+def get_destinatario_reset(db: Session, email: str):
+    """Obtiene solo (correo, nombre) del usuario para el correo de recuperación"""
+    return db.execute(_select_destinatario_reset(), {"correo": email}).first()
+
+
+async def guardar_codigo_reset(email: str, codigo: str) -> None:
+    """
+    Guarda el hash del código con expiración automática
+    Un correo tiene un solo código vigente: pedir otro reemplaza al anterior
+    """
+    await get_redis().setex(_reset_code_key(email), settings.RESET_CODE_TTL_SECONDS, hash_reset_code(codigo))
+
+
+async def codigo_reset_valido(email: str, codigo: str) -> bool:
+    """Indica si el código es el vigente y no ha expirado (sin consumirlo)"""
+    return await _hash_codigo_si_valido(email, codigo) is not None
+
+
+async def consumir_codigo_reset(email: str, codigo: str) -> bool:
+    """Valida el código y lo borra (un solo uso); el borrado es atómico"""
+    guardado = await _hash_codigo_si_valido(email, codigo)
+    if guardado is None:
+        return False
+    return bool(await get_redis().eval(_BORRAR_SI_IGUAL, 1, _reset_code_key(email), guardado))
+
+
+def actualizar_password_por_correo(db: Session, email: str, password_hash: str) -> bool:
+    """
+    Cambia la contraseña de un usuario en un único UPDATE (sin SELECT previo)
+    
+    Returns:
+        True si el usuario existía y se actualizó
+    """
+    result = db.execute(
+        update(Usuario)
+        .where(Usuario.correo == email)
+        .values(
+            password_hash=password_hash
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    
+    if result.rowcount == 0:
+        return False
+    
+    # El UPDATE no pasa por los eventos del ORM y no se conoce el id
+    invalidate_user_cache()
+    return True
 
 
-def confirm_user_email(db: Session, token: str) -> Optional[Usuario]:
+def confirm_user_email(db: Session, token: str):
     """
     Confirma el correo de un usuario usando el token
+    El UPDATE solo aplica si el token sigue vigente, así un token no puede
+    consumirse dos veces aunque lleguen dos confirmaciones simultáneas
+    
+    Returns:
+        Fila (id_usuario, correo) del usuario confirmado o None
     """
-    usuario = db.query(Usuario).filter(
-        Usuario.token_confirmacion == token
-    ).first()
+    token_hash = hash_token(token)
+    usuario = db.execute(_select_usuario_por_token(), {"token_hash": token_hash}).first()
     
     if not usuario:
         return None
     
     # Activar usuario
-    usuario.estado = "Activo"  # ✅ Cambiar a Activo
-    usuario.token_confirmacion = None
-    usuario.correo_confirmado = True
-    usuario.fecha_modificacion = datetime.utcnow()
-    
+    result = db.execute(
+        update(Usuario)
+        .where(
+            Usuario.id_usuario == usuario.id_usuario,
+            Usuario.token_confirmacion_hash == token_hash
+        )
+        .values(
+            estado="Activo",
+            token_confirmacion_hash=None,
+            correo_confirmado=True
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
-    db.refresh(usuario)
     
+    if result.rowcount == 0:
+        return None
+    
+    # El UPDATE no pasa por los eventos del ORM
+    invalidate_user_cache(usuario.id_usuario)
     return usuario
 
-def regenerate_confirmation_token(db: Session, email: str) -> Optional[str]:
+def regenerate_confirmation_token(db: Session, usuario: Usuario) -> Optional[str]:
     """
-    Regenera el token de confirmación para un usuario
+    Regenera el token de confirmación para un usuario ya cargado
     """
-    usuario = db.query(Usuario).filter(Usuario.correo == email).first()
-    
-    if not usuario:
-        return None
-    
     if usuario.estado == "Activo":
         return None
     
     nuevo_token = secrets.token_urlsafe(32)
-    usuario.token_confirmacion = nuevo_token
-    usuario.fecha_modificacion = datetime.utcnow()
+    usuario.token_confirmacion_hash = hash_token(nuevo_token)
     
     db.commit()
     
@@ -1,15 +1,27 @@
 """
 Modelos de evaluaciones y resultados
 """
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Date, Numeric
+from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Date, Numeric, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class Evaluacion(Base):
     """Tabla: evaluaciones"""
     __tablename__ = "evaluaciones"
+    __table_args__ = (
+        # Pendientes del evaluador: WHERE id_evaluador = ? AND estado IN (...) ORDER BY fecha_fin
+        Index("ix_evaluaciones_pendientes", "id_evaluador", "estado", "fecha_fin"),
+        # Listado general filtrado por estado y paginado por id (after_id)
+        Index("ix_evaluaciones_estado_id", "estado", "id_evaluacion"),
+        # Listado por periodo, paginado por id (InnoDB añade la PK a cada índice)
+        Index("ix_evaluaciones_periodo", "periodo"),
+        # Evaluaciones de un evaluado (mis-evaluaciones, filtro id_evaluado + periodo)
+        # y comprobación de duplicados de asignar-masiva, que busca por
+        # id_evaluado, periodo, id_formulario y estado IN (...)
+        Index("ix_evaluaciones_evaluado_periodo", "id_evaluado", "periodo", "id_formulario", "estado"),
+    )
     
     id_evaluacion = Column(Integer, primary_key=True, autoincrement=True)
     id_formulario = Column(Integer, ForeignKey("formularios.id_formulario"), nullable=False)
@@ -29,7 +41,7 @@ class Evaluacion(Base):
     puntaje_total = Column(Numeric(5, 2))
     observaciones_generales = Column(Text)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
-    fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=utcnow())  # Lo calcula la BD en cada UPDATE
     
     # Relaciones
     formulario = relationship("Formulario", back_populates="evaluaciones")
@@ -42,6 +54,10 @@ class Evaluacion(Base):
 class Resultado(Base):
     """Tabla: resultados"""
     __tablename__ = "resultados"
+    __table_args__ = (
+        # Una respuesta por pregunta y evaluación: clave del upsert de responder_evaluacion
+        UniqueConstraint("id_evaluacion", "id_pregunta", name="uq_resultados_evaluacion_pregunta"),
+    )
     
     id_resultado = Column(Integer, primary_key=True, autoincrement=True)
     id_evaluacion = Column(Integer, ForeignKey("evaluaciones.id_evaluacion"), nullable=False)
@@ -49,7 +65,7 @@ class Resultado(Base):
     respuesta = Column(Text)
     puntaje = Column(Numeric(5, 2))
     comentario = Column(Text)
-    fecha_registro = Column(DateTime, default=datetime.utcnow)
+    fecha_registro = Column(DateTime, default=datetime.utcnow, onupdate=utcnow())  # Lo calcula la BD en cada UPDATE
     
     # Relaciones
     evaluacion = relationship("Evaluacion", back_populates="resultados")
@@ -2,10 +2,14 @@
 Rutas de evaluaciones y resultados
 Endpoints CRUD para gestión de evaluaciones
 """
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.paginacion import cursor_fecha_fin
 from app.modules.auth.dependencies import get_current_user, require_role
 from app.modules.users.models import Usuario
 from app.modules.evaluaciones.schemas import (
@@ -18,6 +22,60 @@ from app.modules.evaluaciones import services
 
 router = APIRouter(prefix="/evaluaciones", tags=["Evaluaciones"])
 
+# Las respuestas se construyen desde la BD (model_construct) y se serializan
+# directamente, sin que FastAPI las vuelva a validar; con VALIDATE_RESPONSES
+# se validan contra el schema antes de serializar. response_model se mantiene
+# para la documentación OpenAPI
+_resumenes_adapter = TypeAdapter(List[EvaluacionResumen])
+_resumen_adapter = TypeAdapter(EvaluacionResumen)
+
+
+def _resumenes_response(
+    resumenes: List[EvaluacionResumen],
+    limit: Optional[int] = None,
+    cursor: Callable[[EvaluacionResumen], str] = lambda resumen: str(resumen.id_evaluacion)
+) -> Response:
+    """
+    Serializa una lista de EvaluacionResumen sin revalidarla
+    Con limit (listados paginados por clave), si la página vino llena añade la
+    cabecera X-Next-Cursor con el cursor de la siguiente página (por defecto
+    el after_id)
+    """
+    headers = None
+    if limit is not None and resumenes and len(resumenes) == limit:
+        headers = {"X-Next-Cursor": cursor(resumenes[-1])}
+    if settings.VALIDATE_RESPONSES:
+        resumenes = _resumenes_adapter.validate_python(_resumenes_adapter.dump_python(resumenes))
+    return Response(
+        content=_resumenes_adapter.dump_json(resumenes),
+        media_type="application/json",
+        headers=headers
+    )
+
+
+def _acepta_ndjson(accept: Optional[str] = Header(None, include_in_schema=False)) -> bool:
+    """El cliente pidió 'Accept: application/x-ndjson' (un resumen JSON por línea)"""
+    return "application/x-ndjson" in (accept or "")
+
+
+def _ndjson_response(resumenes: Iterator[EvaluacionResumen]) -> StreamingResponse:
+    """Transmite un listado completo como NDJSON a medida que se lee de la BD"""
+    def lineas():
+        for resumen in resumenes:
+            if settings.VALIDATE_RESPONSES:
+                resumen = _resumen_adapter.validate_python(_resumen_adapter.dump_python(resumen))
+            yield _resumen_adapter.dump_json(resumen) + b"\n"
+    return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+
+def _evaluacion_response(evaluacion) -> Response:
+    """Serializa una Evaluacion (con resultados) como EvaluacionResponse"""
+    if settings.VALIDATE_RESPONSES:
+        respuesta = EvaluacionResponse.model_validate(evaluacion)
+    else:
+        respuesta = services.to_evaluacion_response(evaluacion)
+    return Response(content=respuesta.model_dump_json(), media_type="application/json")
+
 
 # ============================================================================
 # ENDPOINTS DE EVALUACIONES
@@ -32,14 +90,15 @@ def listar_evaluaciones(
     estado: Optional[str] = Query(None),
     periodo: Optional[str] = Query(None),
     tipo: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Paginación por clave: evaluaciones con id menor (ignora skip); la siguiente página viene en X-Next-Cursor"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Manager", "Director"))
 ):
     """
-    Lista evaluaciones con filtros opcionales
+    Lista evaluaciones con filtros opcionales (más recientes primero)
     Requiere: Administrador, RRHH, Manager o Director
     """
-    return services.get_evaluaciones(
+    return _resumenes_response(services.get_evaluaciones(
         db,
         skip=skip,
         limit=limit,
@@ -47,8 +106,9 @@ def listar_evaluaciones(
         id_evaluador=id_evaluador,
         estado=estado,
         periodo=periodo,
-        tipo=tipo
-    )
+        tipo=tipo,
+        after_id=after_id
+    ), limit)
 
 
 @router.get("/pendientes", response_model=List[EvaluacionResumen])
@@ -59,24 +119,33 @@ def mis_evaluaciones_pendientes(
     """
     Obtiene las evaluaciones pendientes del usuario actual como evaluador
     """
-    return services.get_evaluaciones_pendientes(db, current_user.id_usuario)
+    return _resumenes_response(services.get_evaluaciones_pendientes(db, current_user.id_usuario))
 
 
 @router.get("/mis-evaluaciones", response_model=List[EvaluacionResumen])
 def mis_evaluaciones(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    after_id: Optional[int] = Query(None, description="Paginación por clave: evaluaciones con id menor; la siguiente página viene en X-Next-Cursor"),
+    ndjson: bool = Depends(_acepta_ndjson),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
-    Obtiene todas las evaluaciones donde el usuario actual es el evaluado
+    Obtiene las evaluaciones donde el usuario actual es el evaluado
+    Sin limit devuelve todas (con 'Accept: application/x-ndjson', transmitidas por lotes)
     """
-    return services.get_mis_evaluaciones(db, current_user.id_usuario)
+    if ndjson and limit is None:
+        return _ndjson_response(services.stream_mis_evaluaciones(current_user.id_usuario, after_id))
+    return _resumenes_response(services.get_mis_evaluaciones(db, current_user.id_usuario, limit=limit, after_id=after_id), limit)
+
+
 @router.get("/asignadas", response_model=List[EvaluacionResumen])
 def evaluaciones_asignadas(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     estado: Optional[str] = Query(None),
     periodo: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Paginación por clave: evaluaciones con id menor (ignora skip); la siguiente página viene en X-Next-Cursor"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Manager", "Director"))
 ):
@@ -84,26 +153,33 @@ def evaluaciones_asignadas(
     Obtiene las evaluaciones asignadas/creadas por el usuario actual
     Requiere: Administrador, RRHH, Manager o Director
     """
-    return services.get_evaluaciones_asignadas(
+    return _resumenes_response(services.get_evaluaciones_asignadas(
         db, 
         current_user.id_usuario,
         skip=skip,
         limit=limit,
         estado=estado,
-        periodo=periodo
-    )
+        periodo=periodo,
+        after_id=after_id
+    ), limit)
 
 @router.get("/periodo/{periodo}", response_model=List[EvaluacionResumen])
 def evaluaciones_por_periodo(
     periodo: str,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    after_id: Optional[int] = Query(None, description="Paginación por clave: evaluaciones con id menor; la siguiente página viene en X-Next-Cursor"),
+    ndjson: bool = Depends(_acepta_ndjson),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Director"))
 ):
     """
-    Obtiene todas las evaluaciones de un periodo
+    Obtiene las evaluaciones de un periodo (sin limit devuelve todas; con
+    'Accept: application/x-ndjson', transmitidas por lotes)
     Requiere: Administrador, RRHH o Director
     """
-    return services.get_evaluaciones_por_periodo(db, periodo)
+    if ndjson and limit is None:
+        return _ndjson_response(services.stream_evaluaciones_por_periodo(periodo, after_id))
+    return _resumenes_response(services.get_evaluaciones_por_periodo(db, periodo, limit=limit, after_id=after_id), limit)
 
 
 @router.get("/{evaluacion_id}", response_model=EvaluacionResponse)
@@ -114,34 +190,11 @@ def obtener_evaluacion(
 ):
     """
     Obtiene una evaluación por ID con todos sus resultados
+    Acceso: evaluador, evaluado, manager del evaluado, Administrador, RRHH o Director
     """
-    evaluacion = services.get_evaluacion_by_id(db, evaluacion_id)
-    if not evaluacion:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Evaluación no encontrada"
-        )
-    
-    # Verificar si el usuario es manager del evaluado
-    es_manager_del_evaluado = False
-    if evaluacion.evaluado and evaluacion.evaluado.manager_id == current_user.id_usuario:
-        es_manager_del_evaluado = True
-    
-    # Verificar permisos: evaluador, evaluado, manager del evaluado, o roles administrativos
-    tiene_permiso = (
-        current_user.id_usuario == evaluacion.id_evaluador or
-        current_user.id_usuario == evaluacion.id_evaluado or
-        es_manager_del_evaluado or
-        current_user.rol.nombre_rol in ["Administrador", "RRHH", "Director"]
-    )
-    
-    if not tiene_permiso:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para ver esta evaluación"
-        )
-    
-    return evaluacion
+    return _evaluacion_response(services.get_evaluacion_autorizada(db, evaluacion_id, current_user))
+
+
 @router.post("/iniciar", response_model=EvaluacionResponse)
 def iniciar_evaluacion(
     request: IniciarEvaluacionRequest,
@@ -152,7 +205,7 @@ def iniciar_evaluacion(
     Inicia una nueva evaluación
     Requiere: Administrador, RRHH o Manager
     """
-    return services.iniciar_evaluacion(db, request, current_user.id_usuario)
+    return _evaluacion_response(services.iniciar_evaluacion(db, request, current_user.id_usuario))
 
 
 @router.post("/{evaluacion_id}/responder", response_model=EvaluacionResponse)
@@ -166,7 +219,7 @@ def responder_evaluacion(
     Registra respuestas para una evaluación
     Solo el evaluador puede responder
     """
-    return services.responder_evaluacion(db, evaluacion_id, request, current_user.id_usuario)
+    return _evaluacion_response(services.responder_evaluacion(db, evaluacion_id, request, current_user.id_usuario))
 
 
 @router.post("/{evaluacion_id}/completar", response_model=EvaluacionResponse)
@@ -179,7 +232,7 @@ def completar_evaluacion(
     Marca una evaluación como completada y calcula el puntaje
     Solo el evaluador puede completar
     """
-    return services.completar_evaluacion(db, evaluacion_id, current_user.id_usuario)
+    return _evaluacion_response(services.completar_evaluacion(db, evaluacion_id, current_user.id_usuario))
 
 
 @router.post("/{evaluacion_id}/cancelar", response_model=EvaluacionResponse)
@@ -193,7 +246,7 @@ def cancelar_evaluacion(
     Cancela una evaluación
     Requiere: Administrador o RRHH
     """
-    return services.cancelar_evaluacion(db, evaluacion_id, motivo)
+    return _evaluacion_response(services.cancelar_evaluacion(db, evaluacion_id, motivo))
 
 @router.post("/asignar-masiva")
 def asignar_evaluacion_masiva(
@@ -229,7 +282,7 @@ def listar_resultados(
     Lista todos los resultados de una evaluación
     """
     # Verificar que la evaluación existe y el usuario tiene permiso
-    evaluacion = services.get_evaluacion_by_id(db, evaluacion_id)
+    evaluacion = services.get_evaluacion_minimal(db, evaluacion_id)
     if not evaluacion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -271,6 +324,7 @@ def evaluaciones_mi_equipo(
     estado: Optional[str] = Query(None),
     periodo: Optional[str] = Query(None),
     tipo: Optional[str] = Query(None),
+    after: Optional[str] = Query(None, description="Paginación por clave: valor de X-Next-Cursor de la página anterior (ignora skip)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Manager", "Director"))
 ):
@@ -282,15 +336,16 @@ def evaluaciones_mi_equipo(
     
     Requiere: Manager o Director
     """
-    return services.get_evaluaciones_equipo(
+    return _resumenes_response(services.get_evaluaciones_equipo(
         db,
         current_user.id_usuario,
         skip=skip,
         limit=limit,
         estado=estado,
         periodo=periodo,
-        tipo=tipo
-    )
+        tipo=tipo,
+        after=after
+    ), limit, lambda r: cursor_fecha_fin(r.fecha_fin, r.id_evaluacion))
 
 
 @router.get("/equipo/pendientes-manager", response_model=List[EvaluacionResumen])
@@ -304,7 +359,7 @@ def evaluaciones_pendientes_manager(
     
     Requiere: Manager o Director
     """
-    return services.get_evaluaciones_pendientes_equipo(db, current_user.id_usuario)
+    return _resumenes_response(services.get_evaluaciones_pendientes_equipo(db, current_user.id_usuario))
 
 
 @router.get("/equipo/autoevaluaciones", response_model=List[EvaluacionResumen])
@@ -319,4 +374,4 @@ def autoevaluaciones_equipo(
     
     Requiere: Manager o Director
     """
-    return services.get_autoevaluaciones_equipo(db, current_user.id_usuario, estado)
\ No newline at end of file
+    return _resumenes_response(services.get_autoevaluaciones_equipo(db, current_user.id_usuario, estado))
\ No newline at end of file
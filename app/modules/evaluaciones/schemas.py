@@ -2,8 +2,9 @@
 Schemas Pydantic para evaluaciones y resultados
 ✅ CORREGIDO: EvaluacionResumen ahora incluye id_formulario, id_evaluado, id_evaluador y formulario
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
+from typing_extensions import NotRequired, TypedDict
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -34,8 +35,7 @@ class ResultadoResponse(ResultadoBase):
     id_pregunta: int
     fecha_registro: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class EvaluacionBase(BaseModel):
@@ -74,21 +74,19 @@ class EvaluacionResponse(EvaluacionBase):
     # Incluir resultados si es necesario
     resultados: List[ResultadoResponse] = []
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ⭐ NUEVO: Schema para formulario básico
-class FormularioBasico(BaseModel):
+# TypedDict y no BaseModel: solo viaja anidado en EvaluacionResumen y así no
+# se construye un modelo por fila (typing_extensions: Pydantic lo exige en < 3.12)
+class FormularioBasico(TypedDict):
     """Schema básico del formulario para incluir en evaluaciones"""
     id_formulario: int
     nombre_formulario: str
-    descripcion: Optional[str] = None
+    descripcion: NotRequired[Optional[str]]
     tipo_formulario: str
     estado: str
-    
-    class Config:
-        from_attributes = True
 
 
 # ⭐ CORREGIDO: Ahora incluye todos los campos necesarios
@@ -108,8 +106,7 @@ class EvaluacionResumen(BaseModel):
     # ⭐ AGREGADO - Objeto del formulario anidado (tipado correctamente)
     formulario: Optional[FormularioBasico] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class IniciarEvaluacionRequest(BaseModel):
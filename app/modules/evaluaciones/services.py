@@ -2,38 +2,292 @@
 Servicios de evaluaciones
 Lógica de negocio para gestión de evaluaciones y resultados
 """
+import threading
+from cachetools import TTLCache
+from sqlalchemy import event, exists, func, insert, inspect, lambda_stmt, literal, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only, raiseload, selectinload
 from fastapi import HTTPException, status
-from typing import List, Optional
-from datetime import datetime, date, timedelta
-from decimal import Decimal
+from typing import Iterator, List, Optional
+from datetime import date, timedelta
 
+from app.core.config import settings
+from app.core.database import SessionLocal, utcnow
+from app.core.paginacion import despues_del_cursor
 from app.modules.evaluaciones.models import Evaluacion, Resultado
 from app.modules.evaluaciones.schemas import (
     EvaluacionCreate, EvaluacionUpdate, IniciarEvaluacionRequest, ResponderEvaluacionRequest,
-    ResultadoCreate, ResultadoUpdate
+    ResultadoCreate, ResultadoUpdate, EvaluacionResumen, FormularioBasico,
+    EvaluacionResponse, ResultadoResponse
 )
 from app.modules.formularios.models import Formulario, Pregunta
 from app.modules.users.models import Usuario
 
 
+# ============================================================================
+# PROYECCIÓN PARA LISTADOS (EvaluacionResumen)
+# ============================================================================
+
+# Solo las columnas que expone EvaluacionResumen: no se leen
+# observaciones_generales (TEXT) ni se hidratan objetos ORM por fila
+_RESUMEN_COLUMNAS = (
+    Evaluacion.id_evaluacion,
+    Evaluacion.id_formulario,
+    Evaluacion.id_evaluado,
+    Evaluacion.id_evaluador,
+    Evaluacion.tipo_evaluacion,
+    Evaluacion.periodo,
+    Evaluacion.estado,
+    Evaluacion.puntaje_total,
+    Evaluacion.fecha_inicio,
+    Evaluacion.fecha_fin,
+)
+
+_FORMULARIO_COLUMNAS = (
+    Formulario.nombre_formulario,
+    Formulario.descripcion.label("formulario_descripcion"),
+    Formulario.tipo_formulario,
+    Formulario.estado.label("formulario_estado"),
+)
+
+
+def _resumen_query(db: Session):
+    """Query de columnas de EvaluacionResumen con su formulario (un solo JOIN)"""
+    return db.query(*_RESUMEN_COLUMNAS, *_FORMULARIO_COLUMNAS)\
+        .outerjoin(Formulario, Evaluacion.id_formulario == Formulario.id_formulario)
+
+
+def _fila_a_resumen(row) -> EvaluacionResumen:
+    """
+    Convierte una fila de _resumen_query en EvaluacionResumen
+    Los datos vienen tal cual de la BD, así que se construye sin validar
+    """
+    resumen = {col.key: getattr(row, col.key) for col in _RESUMEN_COLUMNAS}
+    resumen["formulario"] = None if row.nombre_formulario is None else FormularioBasico(
+        id_formulario=row.id_formulario,
+        nombre_formulario=row.nombre_formulario,
+        descripcion=row.formulario_descripcion,
+        tipo_formulario=row.tipo_formulario,
+        estado=row.formulario_estado,
+    )
+    return EvaluacionResumen.model_construct(**resumen)
+
+
+def _to_resumen(rows) -> List[EvaluacionResumen]:
+    """Convierte filas de _resumen_query en EvaluacionResumen"""
+    return [_fila_a_resumen(row) for row in rows]
+
+
+def _paginar(query, skip: int, limit: Optional[int], after_id: Optional[int]):
+    """
+    Paginación por clave (after_id) o por offset (skip)
+    Con after_id se devuelven las evaluaciones con id menor, del más reciente
+    al más antiguo, sin que la BD tenga que recorrer y descartar 'skip' filas
+    """
+    query = query.order_by(Evaluacion.id_evaluacion.desc())
+    if after_id is not None:
+        query = query.filter(Evaluacion.id_evaluacion < after_id)
+    elif skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _paginar_por_fecha_fin(query, skip: int, limit: Optional[int], after: Optional[str]):
+    """
+    Como _paginar, para los listados ordenados por vencimiento (fecha_fin, id)
+    Las evaluaciones sin fecha_fin van primero, como las ordena MySQL
+    """
+    query = query.order_by(Evaluacion.fecha_fin.asc(), Evaluacion.id_evaluacion.asc())
+    if after is not None:
+        query = query.filter(
+            despues_del_cursor(Evaluacion.fecha_fin, Evaluacion.id_evaluacion, after)
+        )
+    elif skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# ============================================================================
+# CACHÉ DE PREGUNTAS POR FORMULARIO
+# ============================================================================
+
+# Ids de las preguntas de cada formulario: responder las valida en cada llamada
+# y cambian poco. Se invalida al confirmar una transacción que creó, editó o
+# borró preguntas: invalidar antes (en el flush) dejaría que otra petición
+# volviera a cachear los datos viejos hasta el commit, y así hasta el TTL
+_preguntas_cache: TTLCache = TTLCache(maxsize=256, ttl=settings.PREGUNTAS_CACHE_TTL_SECONDS)
+_preguntas_cache_lock = threading.Lock()
+
+
+def invalidate_preguntas_cache(id_formulario: Optional[int] = None) -> None:
+    """Invalida las preguntas de un formulario (o todo el caché si no se indica id)"""
+    with _preguntas_cache_lock:
+        if id_formulario is None:
+            _preguntas_cache.clear()
+        else:
+            _preguntas_cache.pop(id_formulario, None)
+
+
+# Formularios con preguntas cambiadas en la transacción en curso de la sesión
+_PREGUNTAS_CAMBIADAS = "preguntas_cambiadas"
+
+
+def marcar_preguntas_cambiadas(db: Session, id_formulario: int) -> None:
+    """
+    Invalida las preguntas del formulario al confirmar la transacción de db
+    Para escrituras masivas (Core), que no pasan por el flush del ORM
+    """
+    db.info.setdefault(_PREGUNTAS_CAMBIADAS, set()).add(id_formulario)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_preguntas_cambiadas(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Pregunta):
+            marcar_preguntas_cambiadas(session, obj.id_formulario)
+            # Si la pregunta se movió de formulario, también el anterior
+            for anterior in inspect(obj).attrs.id_formulario.history.deleted:
+                marcar_preguntas_cambiadas(session, anterior)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_preguntas_confirmadas(session):
+    for id_formulario in session.info.pop(_PREGUNTAS_CAMBIADAS, ()):
+        invalidate_preguntas_cache(id_formulario)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_preguntas_cambiadas(session):
+    session.info.pop(_PREGUNTAS_CAMBIADAS, None)
+
+
+def get_preguntas_formulario(db: Session, id_formulario: int) -> frozenset:
+    """Ids de las preguntas de un formulario, del caché o de la BD"""
+    with _preguntas_cache_lock:
+        preguntas = _preguntas_cache.get(id_formulario)
+    
+    if preguntas is None:
+        preguntas = frozenset(
+            id_pregunta for (id_pregunta,) in db.query(Pregunta.id_pregunta).filter(
+                Pregunta.id_formulario == id_formulario
+            )
+        )
+        with _preguntas_cache_lock:
+            _preguntas_cache[id_formulario] = preguntas
+    return preguntas
+
+
+# ============================================================================
+# RESPUESTA DE DETALLE (EvaluacionResponse)
+# ============================================================================
+
+# Campos de las respuestas de detalle, leídos una vez de los schemas
+_CAMPOS_EVALUACION = tuple(c for c in EvaluacionResponse.model_fields if c != "resultados")
+_CAMPOS_RESULTADO = tuple(ResultadoResponse.model_fields)
+
+
+def to_evaluacion_response(evaluacion: Evaluacion) -> EvaluacionResponse:
+    """
+    Construye EvaluacionResponse desde una Evaluacion con sus resultados cargados
+    Los datos vienen tal cual de la BD, así que se construyen sin validar
+    """
+    return EvaluacionResponse.model_construct(
+        **{campo: getattr(evaluacion, campo) for campo in _CAMPOS_EVALUACION},
+        resultados=[
+            ResultadoResponse.model_construct(
+                **{campo: getattr(resultado, campo) for campo in _CAMPOS_RESULTADO}
+            )
+            for resultado in evaluacion.resultados
+        ]
+    )
+
+
 # ============================================================================
 # SERVICIOS DE EVALUACIONES
 # ============================================================================
 
 def get_evaluacion_by_id(db: Session, evaluacion_id: int) -> Optional[Evaluacion]:
-    """Obtiene una evaluación por ID con todas sus relaciones"""
+    """
+    Obtiene una evaluación por ID con sus resultados (lo que expone EvaluacionResponse)
+    selectinload: los resultados llegan en una segunda consulta IN sin repetir
+    las columnas de la evaluación (incluido el TEXT de observaciones) por fila
+    raiseload: cualquier otra relación que se toque lanza error en lugar de
+    hacer una consulta perezosa por objeto
+    """
     return db.query(Evaluacion)\
-        .options(
-            joinedload(Evaluacion.formulario),
-            joinedload(Evaluacion.evaluado),
-            joinedload(Evaluacion.evaluador),
-            joinedload(Evaluacion.resultados)
-        )\
+        .options(selectinload(Evaluacion.resultados), raiseload('*'))\
         .filter(Evaluacion.id_evaluacion == evaluacion_id)\
         .first()
+
+
+def get_evaluacion_minimal(db: Session, evaluacion_id: int) -> Optional[Evaluacion]:
+    """
+    Obtiene una evaluación para validaciones: solo las columnas de permisos y
+    estado (sin observaciones_generales TEXT ni relaciones)
+    """
+    return db.query(Evaluacion).options(
+        load_only(
+            Evaluacion.estado,
+            Evaluacion.id_evaluador,
+            Evaluacion.id_evaluado,
+            Evaluacion.id_formulario
+        ),
+        raiseload('*')
+    ).filter(Evaluacion.id_evaluacion == evaluacion_id).first()
+
+
+# Roles que pueden ver cualquier evaluación
+ROLES_LECTURA_EVALUACIONES = frozenset(("Administrador", "RRHH", "Director"))
+
+
+def get_evaluacion_autorizada(db: Session, evaluacion_id: int, usuario: Usuario) -> Evaluacion:
+    """
+    Obtiene una evaluación con sus resultados si el usuario puede verla
+    (evaluador, evaluado, manager del evaluado o rol administrativo)
+    El permiso se evalúa en la misma consulta; solo si no devuelve nada se
+    comprueba si la evaluación existe para distinguir 404 de 403
+    """
+    query = db.query(Evaluacion)\
+        .options(selectinload(Evaluacion.resultados), raiseload('*'))\
+        .filter(Evaluacion.id_evaluacion == evaluacion_id)
+    
+    if usuario.rol.nombre_rol not in ROLES_LECTURA_EVALUACIONES:
+        uid = usuario.id_usuario
+        query = query.filter(or_(
+            Evaluacion.id_evaluador == uid,
+            Evaluacion.id_evaluado == uid,
+            Evaluacion.evaluado.has(Usuario.manager_id == uid)
+        ))
+    
+    evaluacion = query.first()
+    if evaluacion:
+        return evaluacion
+    
+    existe = db.query(
+        exists().where(Evaluacion.id_evaluacion == evaluacion_id)
+    ).scalar()
+    if not existe:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Evaluación no encontrada"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="No tienes permiso para ver esta evaluación"
+    )
+
+
+# Tope de filas por página en los listados generales, para que ningún llamador
+# pueda leer la tabla completa de una vez
+LIMITE_MAXIMO_EVALUACIONES = 500
+
+
 def get_evaluaciones(
     db: Session,
     skip: int = 0,
@@ -42,23 +296,41 @@ def get_evaluaciones(
     id_evaluador: Optional[int] = None,
     estado: Optional[str] = None,
     periodo: Optional[str] = None,
-    tipo: Optional[str] = None
-) -> List[Evaluacion]:
-    """Obtiene lista de evaluaciones con filtros opcionales"""
-    query = db.query(Evaluacion)
+    tipo: Optional[str] = None,
+    after_id: Optional[int] = None
+) -> List[EvaluacionResumen]:
+    """
+    Obtiene lista de evaluaciones (resumen) con filtros opcionales
+    El limit se acota a LIMITE_MAXIMO_EVALUACIONES aunque no haya filtros
+    
+    Se construye con lambda_stmt: por cada combinación de filtros SQLAlchemy
+    reutiliza la sentencia ya construida y compilada, y los valores de los
+    filtros solo se vuelven a enlazar como parámetros
+    """
+    limit = min(limit, LIMITE_MAXIMO_EVALUACIONES)
+    stmt = lambda_stmt(lambda: select(*_RESUMEN_COLUMNAS, *_FORMULARIO_COLUMNAS).outerjoin(
+        Formulario, Evaluacion.id_formulario == Formulario.id_formulario
+    ))
     
     if id_evaluado:
-        query = query.filter(Evaluacion.id_evaluado == id_evaluado)
+        stmt += lambda s: s.where(Evaluacion.id_evaluado == id_evaluado)
     if id_evaluador:
-        query = query.filter(Evaluacion.id_evaluador == id_evaluador)
+        stmt += lambda s: s.where(Evaluacion.id_evaluador == id_evaluador)
     if estado:
-        query = query.filter(Evaluacion.estado == estado)
+        stmt += lambda s: s.where(Evaluacion.estado == estado)
     if periodo:
-        query = query.filter(Evaluacion.periodo == periodo)
+        stmt += lambda s: s.where(Evaluacion.periodo == periodo)
     if tipo:
-        query = query.filter(Evaluacion.tipo_evaluacion == tipo)
+        stmt += lambda s: s.where(Evaluacion.tipo_evaluacion == tipo)
     
-    return query.offset(skip).limit(limit).all()
+    # Igual que _paginar: por clave (after_id) o por offset (skip)
+    stmt += lambda s: s.order_by(Evaluacion.id_evaluacion.desc()).limit(limit)
+    if after_id is not None:
+        stmt += lambda s: s.where(Evaluacion.id_evaluacion < after_id)
+    elif skip:
+        stmt += lambda s: s.offset(skip)
+    
+    return _to_resumen(db.execute(stmt))
 
 
 def iniciar_evaluacion(
@@ -68,29 +340,30 @@ def iniciar_evaluacion(
 ) -> Evaluacion:
     """Inicia una nueva evaluación"""
     
-    # Verificar que el formulario existe y está activo
-    formulario = db.query(Formulario).filter(
-        Formulario.id_formulario == request.id_formulario
-    ).first()
+    # Estado del formulario y existencia del evaluado en una sola consulta,
+    # sin cargar las filas completas
+    estado_formulario, existe_evaluado = db.query(
+        select(Formulario.estado)
+            .where(Formulario.id_formulario == request.id_formulario)
+            .scalar_subquery(),
+        exists().where(Usuario.id_usuario == request.id_evaluado)
+    ).one()
     
-    if not formulario:
+    # Verificar que el formulario existe y está activo
+    if estado_formulario is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Formulario no encontrado"
         )
     
-    if formulario.estado != "Activo":
+    if estado_formulario != "Activo":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El formulario no está activo"
         )
     
     # Verificar que el evaluado existe
-    evaluado = db.query(Usuario).filter(
-        Usuario.id_usuario == request.id_evaluado
-    ).first()
-    
-    if not evaluado:
+    if not existe_evaluado:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario evaluado no encontrado"
@@ -130,8 +403,8 @@ def responder_evaluacion(
 ) -> Evaluacion:
     """Registra las respuestas de una evaluación"""
     
-    # Obtener la evaluación
-    evaluacion = get_evaluacion_by_id(db, evaluacion_id)
+    # Obtener la evaluación (solo sus columnas: las relaciones no se usan aquí)
+    evaluacion = get_evaluacion_minimal(db, evaluacion_id)
     if not evaluacion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -152,146 +425,137 @@ def responder_evaluacion(
             detail=f"La evaluación está en estado '{evaluacion.estado}' y no puede ser respondida"
         )
     
-    # Registrar o actualizar cada resultado
+    # Validar las preguntas contra las del formulario (cacheadas; sin respuestas no se consulta)
+    preguntas_validas = frozenset()
+    if request.resultados:
+        preguntas_validas = get_preguntas_formulario(db, evaluacion.id_formulario)
     for resultado_data in request.resultados:
-        # Verificar que la pregunta existe y pertenece al formulario
-        pregunta = db.query(Pregunta).filter(
-            Pregunta.id_pregunta == resultado_data.id_pregunta,
-            Pregunta.id_formulario == evaluacion.id_formulario
-        ).first()
-        
-        if not pregunta:
+        if resultado_data.id_pregunta not in preguntas_validas:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Pregunta {resultado_data.id_pregunta} no pertenece a este formulario"
             )
-        
-        # Buscar si ya existe un resultado para esta pregunta
-        resultado_existente = db.query(Resultado).filter(
-            Resultado.id_evaluacion == evaluacion_id,
-            Resultado.id_pregunta == resultado_data.id_pregunta
-        ).first()
-        
-        if resultado_existente:
-            # Actualizar resultado existente
-            resultado_existente.respuesta = resultado_data.respuesta
-            resultado_existente.puntaje = resultado_data.puntaje
-            resultado_existente.comentario = resultado_data.comentario
-            resultado_existente.fecha_registro = datetime.utcnow()
-        else:
-            # Crear nuevo resultado
-            nuevo_resultado = Resultado(
-                id_evaluacion=evaluacion_id,
-                id_pregunta=resultado_data.id_pregunta,
-                respuesta=resultado_data.respuesta,
-                puntaje=resultado_data.puntaje,
-                comentario=resultado_data.comentario
-            )
-            db.add(nuevo_resultado)
+    
+    # Una fila por pregunta (si la pregunta se repite, gana la última)
+    filas = {
+        resultado_data.id_pregunta: {
+            "id_evaluacion": evaluacion_id,
+            "id_pregunta": resultado_data.id_pregunta,
+            "respuesta": resultado_data.respuesta,
+            "puntaje": resultado_data.puntaje,
+            "comentario": resultado_data.comentario,
+            "fecha_registro": utcnow()
+        }
+        for resultado_data in request.resultados
+    }
+    
+    # Registrar o actualizar todos los resultados en un único
+    # INSERT ... ON DUPLICATE KEY UPDATE sobre uq_resultados_evaluacion_pregunta
+    if filas:
+        upsert = mysql_insert(Resultado.__table__).values(list(filas.values()))
+        db.execute(upsert.on_duplicate_key_update(
+            respuesta=upsert.inserted.respuesta,
+            puntaje=upsert.inserted.puntaje,
+            comentario=upsert.inserted.comentario,
+            fecha_registro=upsert.inserted.fecha_registro
+        ))
     
     # Actualizar estado de la evaluación
     evaluacion.estado = "En Curso"
     evaluacion.observaciones_generales = request.observaciones_generales
-    evaluacion.fecha_modificacion = datetime.utcnow()
+    # Explícito: registrar respuestas modifica la evaluación aunque estado y
+    # observaciones no cambien (el onupdate solo aplica si hay UPDATE)
+    evaluacion.fecha_modificacion = utcnow()
     
     try:
         db.commit()
-        db.refresh(evaluacion)
-        return evaluacion
     except IntegrityError:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error al registrar las respuestas"
         )
+    
+    return get_evaluacion_by_id(db, evaluacion_id)
 
 
 def completar_evaluacion(db: Session, evaluacion_id: int, evaluador_id: int) -> Evaluacion:
-    """Marca una evaluación como completada y calcula el puntaje total"""
-    
-    evaluacion = get_evaluacion_by_id(db, evaluacion_id)
-    if not evaluacion:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Evaluación no encontrada"
+    """
+    Marca una evaluación como completada y calcula el puntaje total
+    Un único UPDATE calcula el puntaje y solo aplica si el usuario es el evaluador
+    y no faltan preguntas requeridas; si no afecta filas se consulta el motivo
+    """
+    result = db.execute(
+        update(Evaluacion)
+        .where(
+            Evaluacion.id_evaluacion == evaluacion_id,
+            Evaluacion.id_evaluador == evaluador_id,
+            _preguntas_faltantes(Evaluacion.id_formulario, evaluacion_id) == 0
         )
-    
-    # Verificar permisos
-    if evaluacion.id_evaluador != evaluador_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para completar esta evaluación"
+        .values(
+            estado="Completada",
+            puntaje_total=func.coalesce(func.round(_puntaje_ponderado(evaluacion_id), 2), 0),
+            fecha_fin=date.today()
         )
+        .execution_options(synchronize_session=False)
+    )
     
-    # Verificar que todas las preguntas requeridas tienen respuesta
-    preguntas_requeridas = db.query(Pregunta).filter(
-        Pregunta.id_formulario == evaluacion.id_formulario,
-        Pregunta.requerido == True
-    ).all()
-    
-    resultados_registrados = db.query(Resultado).filter(
-        Resultado.id_evaluacion == evaluacion_id
-    ).all()
-    
-    preguntas_respondidas = {r.id_pregunta for r in resultados_registrados}
-    preguntas_faltantes = [
-        p.id_pregunta for p in preguntas_requeridas 
-        if p.id_pregunta not in preguntas_respondidas
-    ]
-    
-    if preguntas_faltantes:
+    if result.rowcount == 0:
+        db.rollback()
+        fila = db.query(
+            Evaluacion.id_evaluador,
+            _preguntas_faltantes(Evaluacion.id_formulario, evaluacion_id)
+        ).filter(Evaluacion.id_evaluacion == evaluacion_id).first()
+        
+        if not fila:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Evaluación no encontrada"
+            )
+        if fila[0] != evaluador_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permiso para completar esta evaluación"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Faltan responder {len(preguntas_faltantes)} pregunta(s) requerida(s)"
+            detail=f"Faltan responder {fila[1]} pregunta(s) requerida(s)"
         )
     
-    # Calcular puntaje total ponderado
-    puntaje_total = calcular_puntaje_evaluacion(db, evaluacion_id)
-    
-    # Actualizar evaluación
-    evaluacion.estado = "Completada"
-    evaluacion.puntaje_total = puntaje_total
-    evaluacion.fecha_fin = date.today()
-    evaluacion.fecha_modificacion = datetime.utcnow()
-    
     db.commit()
-    db.refresh(evaluacion)
     
-    return evaluacion
+    return get_evaluacion_by_id(db, evaluacion_id)
 
 
-def calcular_puntaje_evaluacion(db: Session, evaluacion_id: int) -> Decimal:
-    """Calcula el puntaje total ponderado de una evaluación"""
-    
-    # Obtener todos los resultados con sus preguntas
-    resultados = db.query(Resultado, Pregunta).join(
+def _preguntas_faltantes(id_formulario, evaluacion_id: int):
+    """Subconsulta escalar: preguntas requeridas del formulario sin resultado en la evaluación"""
+    respondida = exists().where(
+        Resultado.id_evaluacion == evaluacion_id,
+        Resultado.id_pregunta == Pregunta.id_pregunta
+    )
+    return select(func.count(Pregunta.id_pregunta)).where(
+        Pregunta.id_formulario == id_formulario,
+        Pregunta.requerido == True,
+        ~respondida
+    ).scalar_subquery()
+
+
+def _puntaje_ponderado(evaluacion_id: int):
+    """Subconsulta escalar SUM(puntaje * peso) / SUM(peso) de una evaluación"""
+    return select(
+        func.sum(Resultado.puntaje * Pregunta.peso) / func.nullif(func.sum(Pregunta.peso), 0)
+    ).join(
         Pregunta, Resultado.id_pregunta == Pregunta.id_pregunta
-    ).filter(
-        Resultado.id_evaluacion == evaluacion_id
-    ).all()
-    
-    if not resultados:
-        return Decimal('0.00')
-    
-    suma_ponderada = Decimal('0.00')
-    suma_pesos = Decimal('0.00')
-    
-    for resultado, pregunta in resultados:
-        if resultado.puntaje is not None:
-            suma_ponderada += Decimal(str(resultado.puntaje)) * Decimal(str(pregunta.peso))
-            suma_pesos += Decimal(str(pregunta.peso))
-    
-    if suma_pesos == 0:
-        return Decimal('0.00')
-    
-    puntaje_final = suma_ponderada / suma_pesos
-    return round(puntaje_final, 2)
+    ).where(
+        Resultado.id_evaluacion == evaluacion_id,
+        Resultado.puntaje.isnot(None)
+    ).scalar_subquery()
 
 
 def cancelar_evaluacion(db: Session, evaluacion_id: int, motivo: str = None) -> Evaluacion:
     """Cancela una evaluación"""
     
-    evaluacion = get_evaluacion_by_id(db, evaluacion_id)
+    evaluacion = get_evaluacion_minimal(db, evaluacion_id)
     if not evaluacion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -307,38 +571,67 @@ def cancelar_evaluacion(db: Session, evaluacion_id: int, motivo: str = None) ->
     evaluacion.estado = "Cancelada"
     if motivo:
         evaluacion.observaciones_generales = f"CANCELADA: {motivo}"
-    evaluacion.fecha_modificacion = datetime.utcnow()
     
     db.commit()
-    db.refresh(evaluacion)
     
-    return evaluacion
+    return get_evaluacion_by_id(db, evaluacion_id)
 
 
-def get_evaluaciones_pendientes(db: Session, evaluador_id: int) -> List[Evaluacion]:
-    """Obtiene las evaluaciones pendientes de un evaluador"""
-    from sqlalchemy.orm import joinedload
-    
-    return db.query(Evaluacion).options(
-        joinedload(Evaluacion.formulario)  # ⭐ Cargar el formulario relacionado
-    ).filter(
+def get_evaluaciones_pendientes(db: Session, evaluador_id: int) -> List[EvaluacionResumen]:
+    """Obtiene las evaluaciones pendientes (resumen) de un evaluador"""
+    return _to_resumen(_resumen_query(db).filter(
         Evaluacion.id_evaluador == evaluador_id,
         Evaluacion.estado.in_(["Pendiente", "En Curso"])
-    ).order_by(Evaluacion.fecha_fin).all()
+    ).order_by(Evaluacion.fecha_fin).all())
 
 
-def get_mis_evaluaciones(db: Session, usuario_id: int) -> List[Evaluacion]:
-    """Obtiene todas las evaluaciones donde el usuario es el evaluado"""
-    return db.query(Evaluacion).filter(
-        Evaluacion.id_evaluado == usuario_id
-    ).order_by(Evaluacion.fecha_creacion.desc()).all()
+def get_mis_evaluaciones(
+    db: Session,
+    usuario_id: int,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> List[EvaluacionResumen]:
+    """Obtiene las evaluaciones donde el usuario es el evaluado (más recientes primero)"""
+    query = _resumen_query(db).filter(Evaluacion.id_evaluado == usuario_id)
+    return _to_resumen(_paginar(query, 0, limit, after_id).all())
 
 
-def get_evaluaciones_por_periodo(db: Session, periodo: str) -> List[Evaluacion]:
-    """Obtiene todas las evaluaciones de un periodo específico"""
-    return db.query(Evaluacion).filter(
-        Evaluacion.periodo == periodo
-    ).all()
+def get_evaluaciones_por_periodo(
+    db: Session,
+    periodo: str,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> List[EvaluacionResumen]:
+    """Obtiene las evaluaciones de un periodo específico"""
+    query = _resumen_query(db).filter(Evaluacion.periodo == periodo)
+    return _to_resumen(_paginar(query, 0, limit, after_id).all())
+
+
+# Filas que se leen por lote al transmitir un listado completo
+_LOTE_STREAM = 500
+
+
+def _stream_resumenes(filtro, after_id: Optional[int]) -> Iterator[EvaluacionResumen]:
+    """
+    Recorre un listado completo por lotes (yield_per: cursor del lado del
+    servidor) sin cargarlo entero en memoria
+    Usa su propia sesión: la respuesta se envía cuando la sesión de la
+    petición ya se cerró
+    """
+    with SessionLocal() as db:
+        query = _paginar(_resumen_query(db).filter(filtro), 0, None, after_id)
+        for row in query.yield_per(_LOTE_STREAM):
+            yield _fila_a_resumen(row)
+
+
+def stream_mis_evaluaciones(usuario_id: int, after_id: Optional[int] = None) -> Iterator[EvaluacionResumen]:
+    """Como get_mis_evaluaciones sin limit, por lotes"""
+    return _stream_resumenes(Evaluacion.id_evaluado == usuario_id, after_id)
+
+
+def stream_evaluaciones_por_periodo(periodo: str, after_id: Optional[int] = None) -> Iterator[EvaluacionResumen]:
+    """Como get_evaluaciones_por_periodo sin limit, por lotes"""
+    return _stream_resumenes(Evaluacion.periodo == periodo, after_id)
 
 
 def asignar_evaluacion_masiva(
@@ -367,11 +660,31 @@ def asignar_evaluacion_masiva(
             detail="Solo se pueden asignar formularios activos"
         )
     
-    # Obtener todos los usuarios del rol especificado que estén activos
-    usuarios = db.query(Usuario).filter(
+    # Leído antes del commit para no recargar el formulario al responder
+    formulario_nombre = formulario.nombre_formulario
+    fecha_inicio = date.today()
+    fecha_fin = fecha_inicio + timedelta(days=request.dias_plazo)
+    
+    filtro_usuarios = (
         Usuario.id_rol == request.rol_id,
         Usuario.estado == 'Activo'
-    ).all()
+    )
+    # Ya tiene una evaluación pendiente o en curso de este formulario y periodo
+    tiene_pendiente = exists().where(
+        Evaluacion.id_formulario == request.id_formulario,
+        Evaluacion.id_evaluado == Usuario.id_usuario,
+        Evaluacion.periodo == request.periodo,
+        Evaluacion.estado.in_(['Pendiente', 'En Curso'])
+    )
+    
+    # Usuarios activos del rol, marcando los que ya tienen evaluación (una sola consulta)
+    usuarios = db.query(
+        Usuario.id_usuario,
+        Usuario.nombre,
+        Usuario.apellido,
+        Usuario.correo,
+        tiene_pendiente.label("existente")
+    ).filter(*filtro_usuarios).all()
     
     if not usuarios:
         raise HTTPException(
@@ -382,48 +695,45 @@ def asignar_evaluacion_masiva(
     evaluaciones_creadas = []
     evaluaciones_existentes = []
     
-    fecha_inicio = date.today()
-    fecha_fin = fecha_inicio + timedelta(days=request.dias_plazo)
-    
-    # Crear una evaluación para cada usuario
     for usuario in usuarios:
-        # Verificar si ya existe una evaluación pendiente o en curso para este usuario
-        evaluacion_existente = db.query(Evaluacion).filter(
-            Evaluacion.id_formulario == request.id_formulario,
-            Evaluacion.id_evaluado == usuario.id_usuario,
-            Evaluacion.periodo == request.periodo,
-            Evaluacion.estado.in_(['Pendiente', 'En Curso'])
-        ).first()
-        
-        if evaluacion_existente:
-            evaluaciones_existentes.append({
-                'usuario_id': usuario.id_usuario,
-                'nombre': f"{usuario.nombre} {usuario.apellido}",
-                'correo': usuario.correo,
-                'razon': 'Ya tiene una evaluación pendiente o en curso'
-            })
-            continue
-        
-        # Crear nueva evaluación
-        nueva_evaluacion = Evaluacion(
-            id_formulario=request.id_formulario,
-            id_evaluado=usuario.id_usuario,
-            id_evaluador=usuario.id_usuario,  # Para autoevaluación
-            tipo_evaluacion=request.tipo_evaluacion,
-            periodo=request.periodo,
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            estado='Pendiente'
-        )
-        
-        db.add(nueva_evaluacion)
-        evaluaciones_creadas.append({
+        datos = {
             'usuario_id': usuario.id_usuario,
             'nombre': f"{usuario.nombre} {usuario.apellido}",
             'correo': usuario.correo
-        })
+        }
+        if usuario.existente:
+            datos['razon'] = 'Ya tiene una evaluación pendiente o en curso'
+            evaluaciones_existentes.append(datos)
+        else:
+            evaluaciones_creadas.append(datos)
+    
+    # Crear todas las evaluaciones con un único INSERT ... SELECT (autoevaluación:
+    # evaluador = evaluado). El NOT EXISTS lo hace idempotente ante llamadas repetidas
+    nuevas = select(
+        literal(request.id_formulario),
+        Usuario.id_usuario,
+        Usuario.id_usuario,
+        literal(request.tipo_evaluacion, Evaluacion.tipo_evaluacion.type),
+        literal(request.periodo),
+        literal(fecha_inicio),
+        literal(fecha_fin),
+        literal('Pendiente', Evaluacion.estado.type),
+        utcnow(),
+        utcnow()
+    ).where(*filtro_usuarios, ~tiene_pendiente)
     
     try:
+        db.execute(
+            insert(Evaluacion).from_select(
+                [
+                    'id_formulario', 'id_evaluado', 'id_evaluador', 'tipo_evaluacion',
+                    'periodo', 'fecha_inicio', 'fecha_fin', 'estado',
+                    'fecha_creacion', 'fecha_modificacion'
+                ],
+                nuevas,
+                include_defaults=False
+            )
+        )
         db.commit()
         
         return {
@@ -432,7 +742,7 @@ def asignar_evaluacion_masiva(
             "total_usuarios": len(usuarios),
             "evaluaciones_creadas": evaluaciones_creadas,
             "evaluaciones_existentes": evaluaciones_existentes,
-            "formulario_nombre": formulario.nombre_formulario,
+            "formulario_nombre": formulario_nombre,
             "periodo": request.periodo,
             "fecha_inicio": str(fecha_inicio),
             "fecha_fin": str(fecha_fin)
@@ -468,16 +778,20 @@ def update_resultado(
 ) -> Resultado:
     """Actualiza un resultado"""
     
-    resultado = get_resultado_by_id(db, resultado_id)
-    if not resultado:
+    # El resultado y el estado de su evaluación en una sola consulta
+    fila = db.query(Resultado, Evaluacion.estado)\
+        .join(Evaluacion, Evaluacion.id_evaluacion == Resultado.id_evaluacion)\
+        .filter(Resultado.id_resultado == resultado_id)\
+        .first()
+    if not fila:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Resultado no encontrado"
         )
+    resultado, estado_evaluacion = fila
     
     # Verificar que la evaluación no esté completada
-    evaluacion = get_evaluacion_by_id(db, resultado.id_evaluacion)
-    if evaluacion.estado == "Completada":
+    if estado_evaluacion == "Completada":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No se puede modificar una evaluación completada"
@@ -488,8 +802,6 @@ def update_resultado(
     for field, value in update_data.items():
         setattr(resultado, field, value)
     
-    resultado.fecha_registro = datetime.utcnow()
-    
     try:
         db.commit()
         db.refresh(resultado)
@@ -506,15 +818,15 @@ def get_evaluaciones_asignadas(
     skip: int = 0,
     limit: int = 100,
     estado: Optional[str] = None,
-    periodo: Optional[str] = None
-) -> List[Evaluacion]:
+    periodo: Optional[str] = None,
+    after_id: Optional[int] = None
+) -> List[EvaluacionResumen]:
     """
-    Obtiene las evaluaciones creadas/asignadas por un usuario específico
+    Obtiene las evaluaciones (resumen) creadas/asignadas por un usuario específico
     Útil para RRHH, Managers y Directores para ver qué evaluaciones han asignado
     """
-    query = db.query(Evaluacion).join(
-        Formulario, Evaluacion.id_formulario == Formulario.id_formulario
-    ).filter(
+    # El filtro sobre Formulario convierte el outer join de _resumen_query en inner
+    query = _resumen_query(db).filter(
         Formulario.creado_por == usuario_id
     )
     
@@ -525,15 +837,23 @@ def get_evaluaciones_asignadas(
     if periodo:
         query = query.filter(Evaluacion.periodo == periodo)
     
-    # Ordenar por fecha de creación descendente
-    query = query.order_by(Evaluacion.fecha_creacion.desc())
-    
-    return query.offset(skip).limit(limit).all()
+    # Más recientes primero: el id crece con la fecha de creación
+    return _to_resumen(_paginar(query, skip, limit, after_id).all())
 
 # ============================================================================
 # NUEVAS FUNCIONES PARA MANAGERS
 # ============================================================================
 
+def _equipo_query(db: Session, manager_id: int):
+    """
+    _resumen_query limitada a los colaboradores directos activos del manager
+    (un JOIN con usuarios en lugar de consultar antes sus ids)
+    """
+    return _resumen_query(db)\
+        .join(Usuario, Usuario.id_usuario == Evaluacion.id_evaluado)\
+        .filter(Usuario.manager_id == manager_id, Usuario.estado == 'Activo')
+
+
 def get_evaluaciones_equipo(
     db: Session, 
     manager_id: int,
@@ -541,29 +861,14 @@ def get_evaluaciones_equipo(
     limit: int = 100,
     estado: Optional[str] = None,
     periodo: Optional[str] = None,
-    tipo: Optional[str] = None
-) -> List[Evaluacion]:
-    """Obtiene las evaluaciones de los colaboradores directos de un manager"""
-    from sqlalchemy.orm import joinedload
-    from app.modules.users.models import Usuario
-    
-    colaboradores = db.query(Usuario.id_usuario).filter(
-        Usuario.manager_id == manager_id,
-        Usuario.estado == 'Activo'
-    ).all()
-    
-    colaboradores_ids = [c.id_usuario for c in colaboradores]
-    
-    if not colaboradores_ids:
-        return []
-    
-    query = db.query(Evaluacion).options(
-        joinedload(Evaluacion.formulario),
-        joinedload(Evaluacion.evaluado),
-        joinedload(Evaluacion.evaluador)
-    ).filter(
-        Evaluacion.id_evaluado.in_(colaboradores_ids)
-    )
+    tipo: Optional[str] = None,
+    after: Optional[str] = None
+) -> List[EvaluacionResumen]:
+    """
+    Obtiene las evaluaciones (resumen) de los colaboradores directos de un manager
+    Ordenadas por vencimiento; after es el cursor de cursor_fecha_fin
+    """
+    query = _equipo_query(db, manager_id)
     
     if estado:
         query = query.filter(Evaluacion.estado == estado)
@@ -574,56 +879,20 @@ def get_evaluaciones_equipo(
     if tipo:
         query = query.filter(Evaluacion.tipo_evaluacion == tipo)
     
-    query = query.order_by(Evaluacion.fecha_fin.asc())
-    
-    return query.offset(skip).limit(limit).all()
+    return _to_resumen(_paginar_por_fecha_fin(query, skip, limit, after).all())
 
 
-def get_evaluaciones_pendientes_equipo(db: Session, manager_id: int) -> List[Evaluacion]:
+def get_evaluaciones_pendientes_equipo(db: Session, manager_id: int) -> List[EvaluacionResumen]:
     """Obtiene SOLO las evaluaciones pendientes que el manager debe completar"""
-    from sqlalchemy.orm import joinedload
-    from app.modules.users.models import Usuario
-    
-    colaboradores = db.query(Usuario.id_usuario).filter(
-        Usuario.manager_id == manager_id,
-        Usuario.estado == 'Activo'
-    ).all()
-    
-    colaboradores_ids = [c.id_usuario for c in colaboradores]
-    
-    if not colaboradores_ids:
-        return []
-    
-    return db.query(Evaluacion).options(
-        joinedload(Evaluacion.formulario),
-        joinedload(Evaluacion.evaluado)
-    ).filter(
+    return _to_resumen(_equipo_query(db, manager_id).filter(
         Evaluacion.id_evaluador == manager_id,
-        Evaluacion.id_evaluado.in_(colaboradores_ids),
         Evaluacion.estado.in_(["Pendiente", "En Curso"])
-    ).order_by(Evaluacion.fecha_fin.asc()).all()
+    ).order_by(Evaluacion.fecha_fin.asc()).all())
 
 
-def get_autoevaluaciones_equipo(db: Session, manager_id: int, estado: Optional[str] = None) -> List[Evaluacion]:
-    """Obtiene las autoevaluaciones de los colaboradores del manager"""
-    from sqlalchemy.orm import joinedload
-    from app.modules.users.models import Usuario
-    
-    colaboradores = db.query(Usuario.id_usuario).filter(
-        Usuario.manager_id == manager_id,
-        Usuario.estado == 'Activo'
-    ).all()
-    
-    colaboradores_ids = [c.id_usuario for c in colaboradores]
-    
-    if not colaboradores_ids:
-        return []
-    
-    query = db.query(Evaluacion).options(
-        joinedload(Evaluacion.formulario),
-        joinedload(Evaluacion.evaluado)
-    ).filter(
-        Evaluacion.id_evaluado.in_(colaboradores_ids),
+def get_autoevaluaciones_equipo(db: Session, manager_id: int, estado: Optional[str] = None) -> List[EvaluacionResumen]:
+    """Obtiene las autoevaluaciones (resumen) de los colaboradores del manager"""
+    query = _equipo_query(db, manager_id).filter(
         Evaluacion.tipo_evaluacion == 'Autoevaluación',
         Evaluacion.id_evaluador == Evaluacion.id_evaluado
     )
@@ -631,4 +900,4 @@ def get_autoevaluaciones_equipo(db: Session, manager_id: int, estado: Optional[s
     if estado:
         query = query.filter(Evaluacion.estado == estado)
     
-    return query.order_by(Evaluacion.fecha_fin.desc()).all()
\ No newline at end of file
+    return _to_resumen(query.order_by(Evaluacion.fecha_fin.desc()).all())
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Modelos de formularios y preguntas
 """
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Numeric, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -10,6 +10,11 @@ from app.core.database import Base
 class Formulario(Base):
     """Tabla: formularios"""
     __tablename__ = "formularios"
+    __table_args__ = (
+        # Listados (get_formularios / get_formularios_resumen) filtrados por
+        # estado, tipo y periodo
+        Index("ix_formularios_estado_tipo_periodo", "estado", "tipo_formulario", "periodo"),
+    )
     
     id_formulario = Column(Integer, primary_key=True, autoincrement=True)
     nombre_formulario = Column(String(150), nullable=False)
@@ -35,6 +40,10 @@ class Formulario(Base):
 class Pregunta(Base):
     """Tabla: preguntas"""
     __tablename__ = "preguntas"
+    __table_args__ = (
+        # Preguntas requeridas de un formulario (comprobación al completar)
+        Index("ix_preguntas_formulario_requerido", "id_formulario", "requerido"),
+    )
     
     id_pregunta = Column(Integer, primary_key=True, autoincrement=True)
     id_formulario = Column(Integer, ForeignKey("formularios.id_formulario"), nullable=False)
@@ -2,9 +2,11 @@
 Rutas de formularios y preguntas
 Endpoints CRUD para gestión de formularios y preguntas
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.config import settings
 from app.core.database import get_db
 from app.modules.auth.dependencies import get_current_user, require_role
 from app.modules.users.models import Usuario
@@ -16,6 +18,53 @@ from app.modules.formularios import services
 
 router = APIRouter(prefix="/formularios", tags=["Formularios"])
 
+# Como en evaluaciones: las respuestas se construyen desde la BD y se
+# serializan sin que FastAPI las vuelva a validar (salvo con VALIDATE_RESPONSES);
+# response_model se mantiene para la documentación OpenAPI
+_preguntas_adapter = TypeAdapter(List[PreguntaResponse])
+_resumenes_adapter = TypeAdapter(List[FormularioResumen])
+
+
+def _usar_cache(cache_control: Optional[str] = Header(None, include_in_schema=False)) -> bool:
+    """Con 'Cache-Control: no-cache' el listado se lee de la BD (y refresca el caché)"""
+    return "no-cache" not in (cache_control or "").lower()
+
+
+def _formulario_response(formulario) -> Response:
+    """Serializa un Formulario (con preguntas) como FormularioResponse"""
+    if settings.VALIDATE_RESPONSES:
+        respuesta = FormularioResponse.model_validate(formulario)
+    else:
+        respuesta = services.to_formulario_response(formulario)
+    return Response(content=respuesta.model_dump_json(), media_type="application/json")
+
+
+def _resumenes_response(formularios) -> Response:
+    """Serializa una lista de Formulario como List[FormularioResumen]"""
+    if settings.VALIDATE_RESPONSES:
+        respuesta = _resumenes_adapter.validate_python(formularios, from_attributes=True)
+    else:
+        respuesta = [services.to_formulario_resumen(formulario) for formulario in formularios]
+    return Response(content=_resumenes_adapter.dump_json(respuesta), media_type="application/json")
+
+
+def _pregunta_response(pregunta) -> Response:
+    """Serializa una Pregunta como PreguntaResponse"""
+    if settings.VALIDATE_RESPONSES:
+        respuesta = PreguntaResponse.model_validate(pregunta)
+    else:
+        respuesta = services.to_pregunta_response(pregunta)
+    return Response(content=respuesta.model_dump_json(), media_type="application/json")
+
+
+def _preguntas_response(preguntas) -> Response:
+    """Serializa una lista de Pregunta como List[PreguntaResponse]"""
+    if settings.VALIDATE_RESPONSES:
+        respuesta = _preguntas_adapter.validate_python(preguntas, from_attributes=True)
+    else:
+        respuesta = [services.to_pregunta_response(pregunta) for pregunta in preguntas]
+    return Response(content=_preguntas_adapter.dump_json(respuesta), media_type="application/json")
+
 
 # ============================================================================
 # ENDPOINTS DE FORMULARIOS
@@ -28,6 +77,7 @@ def listar_formularios(
     tipo: Optional[str] = Query(None),
     estado: Optional[str] = Query(None),
     periodo: Optional[str] = Query(None),
+    usar_cache: bool = Depends(_usar_cache),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Manager"))
 ):
@@ -35,16 +85,42 @@ def listar_formularios(
     Lista todos los formularios con filtros opcionales
     Requiere: Administrador, RRHH o Manager
     """
-    formularios = services.get_formularios(
+    contenido = services.get_formularios_json(
         db,
         skip=skip,
         limit=limit,
         tipo=tipo,
         estado=estado,
-        periodo=periodo
+        periodo=periodo,
+        usar_cache=usar_cache
     )
     
-    return formularios
+    return Response(content=contenido, media_type="application/json")
+
+
+@router.get("/resumen", response_model=List[FormularioResumen])
+def listar_formularios_resumen(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    tipo: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    periodo: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Manager"))
+):
+    """
+    Lista formularios sin preguntas (solo los datos del resumen)
+    Mismos filtros que el listado completo
+    Requiere: Administrador, RRHH o Manager
+    """
+    return _resumenes_response(services.get_formularios_resumen(
+        db,
+        skip=skip,
+        limit=limit,
+        tipo=tipo,
+        estado=estado,
+        periodo=periodo
+    ))
 
 
 @router.get("/{formulario_id}", response_model=FormularioResponse)
@@ -58,12 +134,11 @@ def obtener_formulario(
     """
     formulario = services.get_formulario_by_id(db, formulario_id)
     if not formulario:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Formulario no encontrado"
         )
-    return formulario
+    return _formulario_response(formulario)
 
 
 @router.post("/", response_model=FormularioResponse)
@@ -76,7 +151,7 @@ def crear_formulario(
     Crea un nuevo formulario con sus preguntas
     Requiere: Administrador o RRHH
     """
-    return services.create_formulario(db, formulario, current_user.id_usuario)
+    return _formulario_response(services.create_formulario(db, formulario, current_user.id_usuario))
 
 
 @router.put("/{formulario_id}", response_model=FormularioResponse)
@@ -90,7 +165,7 @@ def actualizar_formulario(
     Actualiza un formulario
     Requiere: Administrador o RRHH
     """
-    return services.update_formulario(db, formulario_id, formulario_update)
+    return _formulario_response(services.update_formulario(db, formulario_id, formulario_update))
 
 
 @router.delete("/{formulario_id}")
@@ -116,7 +191,7 @@ def activar_formulario(
     Activa un formulario
     Requiere: Administrador o RRHH
     """
-    return services.activar_formulario(db, formulario_id)
+    return _formulario_response(services.activar_formulario(db, formulario_id))
 
 
 @router.post("/{formulario_id}/duplicar", response_model=FormularioResponse)
@@ -130,12 +205,12 @@ def duplicar_formulario(
     Duplica un formulario con todas sus preguntas
     Requiere: Administrador o RRHH
     """
-    return services.duplicar_formulario(
+    return _formulario_response(services.duplicar_formulario(
         db, 
         formulario_id, 
         nuevo_nombre, 
         current_user.id_usuario
-    )
+    ))
 
 
 # ============================================================================
@@ -151,7 +226,7 @@ def listar_preguntas_formulario(
     """
     Lista todas las preguntas de un formulario ordenadas
     """
-    return services.get_preguntas_by_formulario(db, formulario_id)
+    return _preguntas_response(services.get_preguntas_by_formulario(db, formulario_id))
 
 
 @router.get("/preguntas/{pregunta_id}", response_model=PreguntaResponse)
@@ -165,12 +240,11 @@ def obtener_pregunta(
     """
     pregunta = services.get_pregunta_by_id(db, pregunta_id)
     if not pregunta:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pregunta no encontrada"
         )
-    return pregunta
+    return _pregunta_response(pregunta)
 
 
 @router.post("/preguntas", response_model=PreguntaResponse)
@@ -183,7 +257,7 @@ def crear_pregunta(
     Crea una nueva pregunta en un formulario
     Requiere: Administrador o RRHH
     """
-    return services.create_pregunta(db, pregunta)
+    return _pregunta_response(services.create_pregunta(db, pregunta))
 
 
 @router.put("/preguntas/{pregunta_id}", response_model=PreguntaResponse)
@@ -197,7 +271,7 @@ def actualizar_pregunta(
     Actualiza una pregunta
     Requiere: Administrador o RRHH
     """
-    return services.update_pregunta(db, pregunta_id, pregunta_update)
+    return _pregunta_response(services.update_pregunta(db, pregunta_id, pregunta_update))
 
 
 @router.delete("/preguntas/{pregunta_id}")
@@ -225,4 +299,4 @@ def reordenar_preguntas(
     Formato: {"id_pregunta": nuevo_orden}
     Requiere: Administrador o RRHH
     """
-    return services.reordenar_preguntas(db, formulario_id, nuevos_ordenes)
\ No newline at end of file
+    return _preguntas_response(services.reordenar_preguntas(db, formulario_id, nuevos_ordenes))
\ No newline at end of file
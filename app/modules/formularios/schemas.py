@@ -2,7 +2,7 @@
 Schemas Pydantic para formularios y preguntas
 ✅ CORREGIDO: FormularioUpdate ahora acepta preguntas
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
@@ -35,14 +35,18 @@ class PreguntaUpdate(BaseModel):
     competencia: Optional[str] = None
 
 
+class PreguntaFormularioUpdate(PreguntaBase):
+    """Pregunta dentro de FormularioUpdate: con id_pregunta se actualiza la existente, sin él se crea"""
+    id_pregunta: Optional[int] = None
+
+
 class PreguntaResponse(PreguntaBase):
     """Schema de respuesta para preguntas"""
     id_pregunta: int
     id_formulario: int
     fecha_creacion: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FormularioBase(BaseModel):
@@ -70,7 +74,7 @@ class FormularioUpdate(BaseModel):
     periodo: Optional[str] = None
     rol_aplicable: Optional[int] = None
     estado: Optional[str] = None
-    preguntas: Optional[List[PreguntaBase]] = None  # ✅ AGREGADO
+    preguntas: Optional[List[PreguntaFormularioUpdate]] = None  # ✅ AGREGADO
 
 
 class FormularioResponse(FormularioBase):
@@ -84,8 +88,7 @@ class FormularioResponse(FormularioBase):
     # Lista de preguntas
     preguntas: List[PreguntaResponse] = []
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FormularioResumen(BaseModel):
@@ -97,5 +100,4 @@ class FormularioResumen(BaseModel):
     estado: str
     fecha_creacion: datetime
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
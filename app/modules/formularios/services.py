@@ -1,25 +1,67 @@
 """
 Servicios de formularios
-✅ CORREGIDO: Ahora carga las preguntas con joinedload Y actualiza las preguntas
+✅ CORREGIDO: Ahora carga las preguntas con selectinload Y actualiza las preguntas
 """
-from sqlalchemy.orm import Session, joinedload
+import logging
+import threading
+from cachetools import TTLCache
+from pydantic import TypeAdapter
+from sqlalchemy import event, exists, func, insert, lambda_stmt, select, update
+from sqlalchemy.orm import Session, load_only, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from typing import List, Optional
+from app.core.config import settings
+from app.core.database import commit_sin_expirar
+from app.modules.evaluaciones.models import Evaluacion, Resultado
+from app.modules.evaluaciones.services import marcar_preguntas_cambiadas
 from app.modules.formularios.models import Formulario, Pregunta
 from app.modules.formularios.schemas import (
-    FormularioCreate, FormularioUpdate,
-    PreguntaCreate, PreguntaUpdate
+    FormularioCreate, FormularioUpdate, FormularioResponse, FormularioResumen,
+    PreguntaCreate, PreguntaUpdate, PreguntaResponse
 )
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 
 def get_formulario_by_id(db: Session, formulario_id: int) -> Optional[Formulario]:
     """Obtiene un formulario por ID con sus preguntas"""
-    return db.query(Formulario)\
-        .options(joinedload(Formulario.preguntas))\
-        .filter(Formulario.id_formulario == formulario_id)\
-        .first()
+    stmt = lambda_stmt(lambda: select(Formulario)
+        .options(selectinload(Formulario.preguntas))
+        .where(Formulario.id_formulario == formulario_id))
+    return db.execute(stmt).scalars().first()
+
+
+def _existe_formulario(db: Session, formulario_id: int) -> bool:
+    """Comprueba que el formulario existe sin cargarlo (ni sus preguntas)"""
+    return db.query(
+        exists().where(Formulario.id_formulario == formulario_id)
+    ).scalar()
+
+
+def _insertar_preguntas(db: Session, id_formulario: int, preguntas: List[dict]) -> None:
+    """
+    Inserta las preguntas de un formulario en un solo executemany, que PyMySQL
+    envía como INSERT multi-fila (el ORM haría un INSERT por pregunta para
+    recuperar cada id autoincremental, que aquí no se necesita)
+    """
+    if preguntas:
+        db.execute(
+            insert(Pregunta.__table__),
+            [{**pregunta, 'id_formulario': id_formulario} for pregunta in preguntas]
+        )
+
+
+def _recargar_preguntas(db: Session, formulario: Formulario) -> None:
+    """
+    Carga en una sola consulta la colección de preguntas de un formulario
+    recién escrito con Core (db.refresh lanzaría dos: el formulario y la colección)
+    """
+    id_formulario = formulario.id_formulario
+    stmt = lambda_stmt(lambda: select(Pregunta).where(Pregunta.id_formulario == id_formulario))
+    set_committed_value(formulario, 'preguntas', db.execute(stmt).scalars().all())
 
 
 def get_formularios(
@@ -32,18 +74,183 @@ def get_formularios(
 ) -> List[Formulario]:
     """
     Obtiene lista de formularios con filtros opcionales
-    ✅ CORREGIDO: Ahora incluye las preguntas con joinedload
+    ✅ CORREGIDO: Ahora incluye las preguntas con selectinload
+    
+    Con lambda_stmt, como get_evaluaciones: la sentencia compilada se
+    reutiliza por combinación de filtros
     """
-    query = db.query(Formulario).options(joinedload(Formulario.preguntas))
+    # raiseload('*'): cualquier otra relación (creador, evaluaciones) falla en
+    # vez de lanzar un SELECT perezoso por formulario
+    stmt = lambda_stmt(lambda: select(Formulario).options(
+        selectinload(Formulario.preguntas),
+        raiseload('*')
+    ))
     
     if tipo:
-        query = query.filter(Formulario.tipo_formulario == tipo)
+        stmt += lambda s: s.where(Formulario.tipo_formulario == tipo)
     if estado:
-        query = query.filter(Formulario.estado == estado)
+        stmt += lambda s: s.where(Formulario.estado == estado)
     if periodo:
-        query = query.filter(Formulario.periodo == periodo)
+        stmt += lambda s: s.where(Formulario.periodo == periodo)
     
-    return query.offset(skip).limit(limit).all()
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+def get_formularios_resumen(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    tipo: Optional[str] = None,
+    estado: Optional[str] = None,
+    periodo: Optional[str] = None
+) -> List[Formulario]:
+    """
+    Listado de formularios para FormularioResumen, con los mismos filtros que
+    get_formularios: load_only lee solo las columnas del resumen (ni la
+    descripción ni las preguntas)
+    """
+    stmt = lambda_stmt(lambda: select(Formulario).options(
+        load_only(
+            Formulario.id_formulario, Formulario.nombre_formulario,
+            Formulario.tipo_formulario, Formulario.periodo,
+            Formulario.estado, Formulario.fecha_creacion
+        ),
+        raiseload('*')
+    ))
+    
+    if tipo:
+        stmt += lambda s: s.where(Formulario.tipo_formulario == tipo)
+    if estado:
+        stmt += lambda s: s.where(Formulario.estado == estado)
+    if periodo:
+        stmt += lambda s: s.where(Formulario.periodo == periodo)
+    
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+# ============================================================================
+# RESPUESTAS (FormularioResponse / PreguntaResponse)
+# ============================================================================
+
+# Campos de las respuestas, leídos una vez de los schemas
+_CAMPOS_FORMULARIO = tuple(c for c in FormularioResponse.model_fields if c != "preguntas")
+_CAMPOS_PREGUNTA = tuple(PreguntaResponse.model_fields)
+_CAMPOS_RESUMEN = tuple(FormularioResumen.model_fields)
+
+
+def to_pregunta_response(pregunta: Pregunta) -> PreguntaResponse:
+    """Construye PreguntaResponse sin validar: los datos vienen tal cual de la BD"""
+    return PreguntaResponse.model_construct(
+        **{campo: getattr(pregunta, campo) for campo in _CAMPOS_PREGUNTA}
+    )
+
+
+def to_formulario_response(formulario: Formulario) -> FormularioResponse:
+    """
+    Construye FormularioResponse desde un Formulario con sus preguntas cargadas
+    Los datos vienen tal cual de la BD, así que se construyen sin validar
+    """
+    return FormularioResponse.model_construct(
+        **{campo: getattr(formulario, campo) for campo in _CAMPOS_FORMULARIO},
+        preguntas=[to_pregunta_response(pregunta) for pregunta in formulario.preguntas]
+    )
+
+
+def to_formulario_resumen(formulario: Formulario) -> FormularioResumen:
+    """Construye FormularioResumen sin validar (solo lee las columnas del resumen)"""
+    return FormularioResumen.model_construct(
+        **{campo: getattr(formulario, campo) for campo in _CAMPOS_RESUMEN}
+    )
+
+
+# ============================================================================
+# CACHÉ DEL LISTADO DE FORMULARIOS
+# ============================================================================
+
+# JSON ya serializado del listado por filtros: los formularios cambian poco y
+# se listan en cada pantalla. Una transacción que escribe formularios o
+# preguntas vacía el caché al confirmarse (el listado no depende del usuario,
+# solo del rol que lo pide). Vaciarlo en el flush, antes del commit, dejaría
+# que otra petición volviera a cachear el listado viejo hasta el TTL
+_listados_cache: TTLCache = TTLCache(maxsize=256, ttl=settings.FORMULARIOS_CACHE_TTL_SECONDS)
+_listados_cache_lock = threading.Lock()
+_formularios_adapter = TypeAdapter(List[FormularioResponse])
+
+
+def invalidate_formularios_cache() -> None:
+    """Vacía el caché del listado de formularios"""
+    with _listados_cache_lock:
+        _listados_cache.clear()
+
+
+# La transacción en curso de la sesión escribió formularios o preguntas (el
+# caché está indexado por filtros, no por id: se vacía entero)
+_FORMULARIOS_CAMBIADOS = "formularios_cambiados"
+
+
+def marcar_formularios_cambiados(db: Session) -> None:
+    """
+    Vacía el caché del listado al confirmar la transacción de db
+    Para escrituras masivas (Core), que no pasan por el flush del ORM
+    """
+    db.info[_FORMULARIOS_CAMBIADOS] = True
+
+
+# Las altas/bajas masivas de preguntas en create/update/duplicar van siempre
+# acompañadas de un INSERT o UPDATE del formulario, que sí pasa por el flush
+@event.listens_for(Session, "after_flush")
+def _registrar_formularios_cambiados(session, flush_context):
+    if any(
+        isinstance(obj, (Formulario, Pregunta))
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        marcar_formularios_cambiados(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_formularios_confirmados(session):
+    if session.info.pop(_FORMULARIOS_CAMBIADOS, False):
+        invalidate_formularios_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_formularios_cambiados(session):
+    session.info.pop(_FORMULARIOS_CAMBIADOS, None)
+
+
+def get_formularios_json(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    tipo: Optional[str] = None,
+    estado: Optional[str] = None,
+    periodo: Optional[str] = None,
+    usar_cache: bool = True
+) -> bytes:
+    """
+    Listado de formularios (get_formularios) serializado como List[FormularioResponse]
+    Se sirve del caché si hay una copia reciente para los mismos filtros
+    """
+    key = (skip, limit, tipo, estado, periodo)
+    if usar_cache:
+        with _listados_cache_lock:
+            contenido = _listados_cache.get(key)
+        if contenido is not None:
+            return contenido
+    
+    formularios = get_formularios(
+        db, skip=skip, limit=limit, tipo=tipo, estado=estado, periodo=periodo
+    )
+    if settings.VALIDATE_RESPONSES:
+        respuesta = _formularios_adapter.validate_python(formularios, from_attributes=True)
+    else:
+        respuesta = [to_formulario_response(formulario) for formulario in formularios]
+    contenido = _formularios_adapter.dump_json(respuesta)
+    with _listados_cache_lock:
+        _listados_cache[key] = contenido
+    return contenido
 
 
 def create_formulario(
@@ -65,21 +272,16 @@ def create_formulario(
     try:
         db.flush()
         
-        # Crear las preguntas asociadas
+        # Crear las preguntas asociadas (el orden es la posición en la lista)
         if formulario.preguntas:
-            for idx, pregunta_data in enumerate(formulario.preguntas):
-                # Convertir a dict y actualizar el orden
-                pregunta_dict = pregunta_data.model_dump()
-                pregunta_dict['orden'] = idx + 1
-                
-                db_pregunta = Pregunta(
-                    id_formulario=db_formulario.id_formulario,
-                    **pregunta_dict
-                )
-                db.add(db_pregunta)
+            _insertar_preguntas(db, db_formulario.id_formulario, [
+                {**pregunta_data.model_dump(), 'orden': idx + 1}
+                for idx, pregunta_data in enumerate(formulario.preguntas)
+            ])
         
-        db.commit()
-        db.refresh(db_formulario)
+        commit_sin_expirar(db)
+        # Las preguntas se insertaron con Core: solo se carga esa colección
+        _recargar_preguntas(db, db_formulario)
         return db_formulario
         
     except IntegrityError as e:
@@ -116,32 +318,53 @@ def update_formulario(
     
     # ✅ NUEVO: Actualizar preguntas si se enviaron
     if hasattr(formulario_update, 'preguntas') and formulario_update.preguntas is not None:
-        print(f"🔄 Actualizando preguntas del formulario {formulario_id}")
+        logger.debug("Actualizando preguntas del formulario %d", formulario_id)
         
-        # 1. Eliminar todas las preguntas existentes
-        db.query(Pregunta).filter(Pregunta.id_formulario == formulario_id).delete()
-        
-        # 2. Crear las nuevas preguntas
+        # 1. Repartir las preguntas recibidas: las que traen el id de una
+        #    pregunta actual del formulario se actualizan, el resto se crean
+        actuales = {pregunta.id_pregunta for pregunta in db_formulario.preguntas}
+        a_actualizar = []
+        a_insertar = []
         for idx, pregunta_data in enumerate(formulario_update.preguntas):
-            pregunta_dict = pregunta_data.model_dump() if hasattr(pregunta_data, 'model_dump') else pregunta_data
+            pregunta_dict = pregunta_data.model_dump(exclude={'id_pregunta'})
             pregunta_dict['orden'] = idx + 1
             
-            print(f"  📝 Pregunta {idx + 1}: tipo='{pregunta_dict.get('tipo_pregunta')}', texto='{pregunta_dict.get('texto_pregunta')[:50]}...'")
-            
-            nueva_pregunta = Pregunta(
-                id_formulario=formulario_id,
-                **pregunta_dict
+            logger.debug(
+                "Pregunta %d: tipo=%s, texto=%.50s",
+                idx + 1, pregunta_dict.get('tipo_pregunta'), pregunta_dict.get('texto_pregunta')
             )
-            db.add(nueva_pregunta)
+            
+            if pregunta_data.id_pregunta in actuales:
+                a_actualizar.append({**pregunta_dict, 'id_pregunta': pregunta_data.id_pregunta})
+            else:
+                a_insertar.append(pregunta_dict)
+        
+        # 2. Eliminar solo las preguntas que ya no vienen
+        a_eliminar = actuales - {pregunta['id_pregunta'] for pregunta in a_actualizar}
+        if a_eliminar:
+            db.query(Pregunta).filter(
+                Pregunta.id_pregunta.in_(a_eliminar)
+            ).delete(synchronize_session=False)
+        
+        # 3. Actualizar las existentes (UPDATE por clave primaria en un executemany)
+        #    y crear las nuevas
+        if a_actualizar:
+            db.execute(update(Pregunta), a_actualizar)
+        _insertar_preguntas(db, formulario_id, a_insertar)
+        
+        # Las escrituras masivas no pasan por el flush del ORM: marcar a mano
+        marcar_preguntas_cambiadas(db, formulario_id)
     
     try:
-        db.commit()
-        db.refresh(db_formulario)
-        print(f"✅ Formulario {formulario_id} actualizado correctamente")
+        commit_sin_expirar(db)
+        if formulario_update.preguntas is not None:
+            # Las preguntas se escribieron con Core: la colección cargada quedó vieja
+            _recargar_preguntas(db, db_formulario)
+        logger.debug("Formulario %d actualizado correctamente", formulario_id)
         return db_formulario
     except IntegrityError as e:
         db.rollback()
-        print(f"❌ Error al actualizar formulario: {str(e)}")
+        logger.warning("Error al actualizar formulario %d: %s", formulario_id, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error al actualizar el formulario"
@@ -157,15 +380,15 @@ def delete_formulario(db: Session, formulario_id: int) -> dict:
             detail="Formulario no encontrado"
         )
     
-    from app.modules.evaluaciones.models import Evaluacion
-    evaluaciones_count = db.query(Evaluacion).filter(
-        Evaluacion.id_formulario == formulario_id
-    ).count()
+    # EXISTS se detiene en la primera fila; COUNT recorre todas
+    tiene_evaluaciones = db.query(
+        exists().where(Evaluacion.id_formulario == formulario_id)
+    ).scalar()
     
-    if evaluaciones_count > 0:
+    if tiene_evaluaciones:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"No se puede eliminar el formulario porque tiene {evaluaciones_count} evaluación(es) asociada(s)"
+            detail="No se puede eliminar el formulario porque tiene evaluaciones asociadas"
         )
     
     db_formulario.estado = "Archivado"
@@ -186,8 +409,7 @@ def activar_formulario(db: Session, formulario_id: int) -> Formulario:
     
     db_formulario.estado = "Activo"
     db_formulario.fecha_modificacion = datetime.utcnow()
-    db.commit()
-    db.refresh(db_formulario)
+    commit_sin_expirar(db)
     
     return db_formulario
 
@@ -219,22 +441,22 @@ def duplicar_formulario(
     db.add(nuevo_formulario)
     db.flush()
     
-    for pregunta_original in formulario_original.preguntas:
-        nueva_pregunta = Pregunta(
-            id_formulario=nuevo_formulario.id_formulario,
-            texto_pregunta=pregunta_original.texto_pregunta,
-            tipo_pregunta=pregunta_original.tipo_pregunta,
-            peso=pregunta_original.peso,
-            opciones=pregunta_original.opciones,
-            orden=pregunta_original.orden,
-            requerido=pregunta_original.requerido,
-            competencia=pregunta_original.competencia
-        )
-        db.add(nueva_pregunta)
+    _insertar_preguntas(db, nuevo_formulario.id_formulario, [
+        {
+            'texto_pregunta': pregunta_original.texto_pregunta,
+            'tipo_pregunta': pregunta_original.tipo_pregunta,
+            'peso': pregunta_original.peso,
+            'opciones': pregunta_original.opciones,
+            'orden': pregunta_original.orden,
+            'requerido': pregunta_original.requerido,
+            'competencia': pregunta_original.competencia
+        }
+        for pregunta_original in formulario_original.preguntas
+    ])
     
     try:
-        db.commit()
-        db.refresh(nuevo_formulario)
+        commit_sin_expirar(db)
+        _recargar_preguntas(db, nuevo_formulario)
         return nuevo_formulario
     except IntegrityError:
         db.rollback()
@@ -250,37 +472,37 @@ def duplicar_formulario(
 
 def get_pregunta_by_id(db: Session, pregunta_id: int) -> Optional[Pregunta]:
     """Obtiene una pregunta por ID"""
-    return db.query(Pregunta).filter(Pregunta.id_pregunta == pregunta_id).first()
+    stmt = lambda_stmt(lambda: select(Pregunta).where(Pregunta.id_pregunta == pregunta_id))
+    return db.execute(stmt).scalars().first()
 
 
 def get_preguntas_by_formulario(db: Session, formulario_id: int) -> List[Pregunta]:
     """Obtiene todas las preguntas de un formulario ordenadas"""
-    return db.query(Pregunta).filter(
+    stmt = lambda_stmt(lambda: select(Pregunta).where(
         Pregunta.id_formulario == formulario_id
-    ).order_by(Pregunta.orden).all()
+    ).order_by(Pregunta.orden))
+    return db.execute(stmt).scalars().all()
 
 
 def create_pregunta(db: Session, pregunta: PreguntaCreate) -> Pregunta:
     """Crea una nueva pregunta"""
-    formulario = get_formulario_by_id(db, pregunta.id_formulario)
-    if not formulario:
+    if not _existe_formulario(db, pregunta.id_formulario):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Formulario no encontrado"
         )
     
     if pregunta.orden == 0:
-        max_orden = db.query(Pregunta).filter(
+        max_orden = db.query(func.coalesce(func.max(Pregunta.orden), 0)).filter(
             Pregunta.id_formulario == pregunta.id_formulario
-        ).count()
+        ).scalar()
         pregunta.orden = max_orden + 1
     
     db_pregunta = Pregunta(**pregunta.model_dump())
     db.add(db_pregunta)
     
     try:
-        db.commit()
-        db.refresh(db_pregunta)
+        commit_sin_expirar(db)
         return db_pregunta
     except IntegrityError:
         db.rollback()
@@ -299,13 +521,12 @@ def update_pregunta(db: Session, pregunta_id: int, pregunta_update: PreguntaUpda
             detail="Pregunta no encontrada"
         )
     
-    update_data = pregunta_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_pregunta, field, value)
+    # Solo los campos enviados, leídos directamente del modelo (sin model_dump)
+    for field in pregunta_update.model_fields_set:
+        setattr(db_pregunta, field, getattr(pregunta_update, field))
     
     try:
-        db.commit()
-        db.refresh(db_pregunta)
+        commit_sin_expirar(db)
         return db_pregunta
     except IntegrityError:
         db.rollback()
@@ -324,15 +545,14 @@ def delete_pregunta(db: Session, pregunta_id: int) -> dict:
             detail="Pregunta no encontrada"
         )
     
-    from app.modules.evaluaciones.models import Resultado
-    resultados_count = db.query(Resultado).filter(
-        Resultado.id_pregunta == pregunta_id
-    ).count()
+    tiene_resultados = db.query(
+        exists().where(Resultado.id_pregunta == pregunta_id)
+    ).scalar()
     
-    if resultados_count > 0:
+    if tiene_resultados:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"No se puede eliminar la pregunta porque tiene {resultados_count} respuesta(s) asociada(s)"
+            detail="No se puede eliminar la pregunta porque tiene respuestas asociadas"
         )
     
     db.delete(db_pregunta)
@@ -343,19 +563,30 @@ def delete_pregunta(db: Session, pregunta_id: int) -> dict:
 
 def reordenar_preguntas(db: Session, formulario_id: int, nuevos_ordenes: dict[int, int]) -> List[Pregunta]:
     """Reordena las preguntas de un formulario"""
-    formulario = get_formulario_by_id(db, formulario_id)
-    if not formulario:
+    if not _existe_formulario(db, formulario_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Formulario no encontrado"
         )
     
-    for pregunta_id, nuevo_orden in nuevos_ordenes.items():
-        pregunta = get_pregunta_by_id(db, pregunta_id)
-        if pregunta and pregunta.id_formulario == formulario_id:
-            pregunta.orden = nuevo_orden
+    # Validar en una sola consulta qué ids pertenecen al formulario
+    ids_validos = {
+        row.id_pregunta for row in db.query(Pregunta.id_pregunta).filter(
+            Pregunta.id_formulario == formulario_id,
+            Pregunta.id_pregunta.in_(nuevos_ordenes.keys())
+        ).all()
+    } if nuevos_ordenes else set()
     
     try:
+        if ids_validos:
+            # UPDATE por clave primaria en un executemany
+            db.execute(update(Pregunta), [
+                {"id_pregunta": pregunta_id, "orden": nuevo_orden}
+                for pregunta_id, nuevo_orden in nuevos_ordenes.items()
+                if pregunta_id in ids_validos
+            ])
+            # La actualización masiva no pasa por el flush del ORM
+            marcar_formularios_cambiados(db)
         db.commit()
         return get_preguntas_by_formulario(db, formulario_id)
     except IntegrityError:
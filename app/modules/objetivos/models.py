@@ -1,7 +1,7 @@
 """
 Modelos de objetivos
 """
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Date, Numeric
+from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Date, Numeric, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -10,6 +10,12 @@ from app.core.database import Base
 class Objetivo(Base):
     """Tabla: objetivos"""
     __tablename__ = "objetivos"
+    __table_args__ = (
+        # Listado filtrado por usuario, periodo y estado
+        Index("ix_objetivos_usuario_periodo_estado", "id_usuario", "periodo", "estado"),
+        # Objetivos de un usuario ordenados por fecha_fin (mis-objetivos)
+        Index("ix_objetivos_usuario_fecha_fin", "id_usuario", "fecha_fin"),
+    )
     
     id_objetivo = Column(Integer, primary_key=True, autoincrement=True)
     id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
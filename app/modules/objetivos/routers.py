@@ -2,10 +2,13 @@
 Rutas de objetivos
 Endpoints CRUD para gestión de objetivos
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.paginacion import cursor_fecha_fin
 from app.modules.auth.dependencies import get_current_user, require_role
 from app.modules.users.models import Usuario
 from app.modules.objetivos.schemas import ObjetivoCreate, ObjetivoUpdate, ObjetivoResponse
@@ -13,6 +16,31 @@ from app.modules.objetivos import services
 
 router = APIRouter(prefix="/objetivos", tags=["Objetivos"])
 
+# Los listados se construyen desde la BD y se serializan en un solo dump, sin
+# que FastAPI valide cada objetivo (salvo con VALIDATE_RESPONSES);
+# response_model se mantiene para la documentación OpenAPI
+_objetivos_adapter = TypeAdapter(List[ObjetivoResponse])
+
+
+def _objetivos_response(objetivos, limit: Optional[int] = None) -> Response:
+    """
+    Serializa una lista de Objetivo como List[ObjetivoResponse]
+    Con limit, si la página vino llena añade la cabecera X-Next-Cursor con el
+    cursor de la siguiente página
+    """
+    headers = None
+    if limit is not None and objetivos and len(objetivos) == limit:
+        headers = {"X-Next-Cursor": cursor_fecha_fin(objetivos[-1].fecha_fin, objetivos[-1].id_objetivo)}
+    if settings.VALIDATE_RESPONSES:
+        respuesta = _objetivos_adapter.validate_python(objetivos, from_attributes=True)
+    else:
+        respuesta = [services.to_objetivo_response(objetivo) for objetivo in objetivos]
+    return Response(
+        content=_objetivos_adapter.dump_json(respuesta),
+        media_type="application/json",
+        headers=headers
+    )
+
 
 @router.get("/", response_model=List[ObjetivoResponse])
 def listar_objetivos(
@@ -26,7 +54,7 @@ def listar_objetivos(
     current_user: Usuario = Depends(require_role("Administrador", "RRHH", "Manager", "Director"))
 ):
     """Lista objetivos con filtros"""
-    return services.get_objetivos(
+    return _objetivos_response(services.get_objetivos(
         db,
         skip=skip,
         limit=limit,
@@ -34,16 +62,24 @@ def listar_objetivos(
         periodo=periodo,
         estado=estado,
         tipo=tipo
-    )
+    ))
 
 
 @router.get("/mis-objetivos", response_model=List[ObjetivoResponse])
 def mis_objetivos(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Paginación por clave: valor de X-Next-Cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    """Obtiene los objetivos del usuario actual"""
-    return services.get_mis_objetivos(db, current_user.id_usuario)
+    """
+    Obtiene los objetivos del usuario actual ordenados por fecha_fin
+    Sin limit devuelve todos
+    """
+    return _objetivos_response(
+        services.get_mis_objetivos(db, current_user.id_usuario, limit=limit, after=after),
+        limit
+    )
 
 
 @router.get("/{objetivo_id}", response_model=ObjetivoResponse)
@@ -55,7 +91,6 @@ def obtener_objetivo(
     """Obtiene un objetivo por ID"""
     objetivo = services.get_objetivo_by_id(db, objetivo_id)
     if not objetivo:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Objetivo no encontrado"
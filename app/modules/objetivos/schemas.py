@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para objetivos
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 from datetime import datetime, date
 from decimal import Decimal
@@ -44,5 +44,4 @@ class ObjetivoResponse(ObjetivoBase):
     fecha_creacion: datetime
     fecha_modificacion: datetime
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
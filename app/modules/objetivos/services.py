@@ -2,18 +2,33 @@
 Servicios de objetivos
 Lógica de negocio para gestión de objetivos de desempeño
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import Session, raiseload
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from typing import List, Optional
+from app.core.database import commit_sin_expirar
+from app.core.paginacion import despues_del_cursor
 from app.modules.objetivos.models import Objetivo
-from app.modules.objetivos.schemas import ObjetivoCreate, ObjetivoUpdate
+from app.modules.objetivos.schemas import ObjetivoCreate, ObjetivoUpdate, ObjetivoResponse
 from datetime import datetime
 
 
+# Campos de ObjetivoResponse, leídos una vez del schema
+_CAMPOS_OBJETIVO = tuple(ObjetivoResponse.model_fields)
+
+
+def to_objetivo_response(objetivo: Objetivo) -> ObjetivoResponse:
+    """Construye ObjetivoResponse sin validar: los datos vienen tal cual de la BD"""
+    return ObjetivoResponse.model_construct(
+        **{campo: getattr(objetivo, campo) for campo in _CAMPOS_OBJETIVO}
+    )
+
+
 def get_objetivo_by_id(db: Session, objetivo_id: int) -> Optional[Objetivo]:
     """Obtiene un objetivo por ID"""
-    return db.query(Objetivo).filter(Objetivo.id_objetivo == objetivo_id).first()
+    stmt = lambda_stmt(lambda: select(Objetivo).where(Objetivo.id_objetivo == objetivo_id))
+    return db.execute(stmt).scalars().first()
 
 
 def get_objetivos(
@@ -25,19 +40,25 @@ def get_objetivos(
     estado: Optional[str] = None,
     tipo: Optional[str] = None
 ) -> List[Objetivo]:
-    """Obtiene lista de objetivos con filtros"""
-    query = db.query(Objetivo)
+    """
+    Obtiene lista de objetivos con filtros
+    Con lambda_stmt: la sentencia compilada se reutiliza por combinación de filtros
+    """
+    # raiseload('*'): acceder a Objetivo.usuario falla en vez de lanzar un
+    # SELECT perezoso por objetivo
+    stmt = lambda_stmt(lambda: select(Objetivo).options(raiseload('*')))
     
     if id_usuario:
-        query = query.filter(Objetivo.id_usuario == id_usuario)
+        stmt += lambda s: s.where(Objetivo.id_usuario == id_usuario)
     if periodo:
-        query = query.filter(Objetivo.periodo == periodo)
+        stmt += lambda s: s.where(Objetivo.periodo == periodo)
     if estado:
-        query = query.filter(Objetivo.estado == estado)
+        stmt += lambda s: s.where(Objetivo.estado == estado)
     if tipo:
-        query = query.filter(Objetivo.tipo == tipo)
+        stmt += lambda s: s.where(Objetivo.tipo == tipo)
     
-    return query.offset(skip).limit(limit).all()
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
 
 
 def create_objetivo(
@@ -55,8 +76,7 @@ def create_objetivo(
     db.add(db_objetivo)
     
     try:
-        db.commit()
-        db.refresh(db_objetivo)
+        commit_sin_expirar(db)
         return db_objetivo
     except IntegrityError:
         db.rollback()
@@ -80,15 +100,14 @@ def update_objetivo(
             detail="Objetivo no encontrado"
         )
     
-    update_data = objetivo_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_objetivo, field, value)
+    # Solo los campos enviados, leídos directamente del modelo (sin model_dump)
+    for field in objetivo_update.model_fields_set:
+        setattr(db_objetivo, field, getattr(objetivo_update, field))
     
     db_objetivo.fecha_modificacion = datetime.utcnow()
     
     try:
-        db.commit()
-        db.refresh(db_objetivo)
+        commit_sin_expirar(db)
         return db_objetivo
     except IntegrityError:
         db.rollback()
@@ -114,8 +133,27 @@ def delete_objetivo(db: Session, objetivo_id: int) -> dict:
     return {"message": "Objetivo eliminado exitosamente"}
 
 
-def get_mis_objetivos(db: Session, usuario_id: int) -> List[Objetivo]:
-    """Obtiene los objetivos de un usuario"""
-    return db.query(Objetivo).filter(
+def get_mis_objetivos(
+    db: Session,
+    usuario_id: int,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> List[Objetivo]:
+    """
+    Obtiene los objetivos de un usuario ordenados por vencimiento (fecha_fin, id)
+    Sin limit devuelve todos; after (cursor_fecha_fin del último de la página
+    anterior) pagina por clave. Los objetivos sin fecha_fin van primero, como
+    los ordena MySQL
+    """
+    query = db.query(Objetivo).options(raiseload('*')).filter(
         Objetivo.id_usuario == usuario_id
-    ).order_by(Objetivo.fecha_fin).all()
\ No newline at end of file
+    ).order_by(Objetivo.fecha_fin.asc(), Objetivo.id_objetivo.asc())
+    
+    if after is not None:
+        query = query.filter(
+            despues_del_cursor(Objetivo.fecha_fin, Objetivo.id_objetivo, after)
+        )
+    if limit is not None:
+        query = query.limit(limit)
+    
+    return query.all()
\ No newline at end of file
@@ -1,6 +1,8 @@
 """
 Rutas de reportes y notificaciones
 """
+import os
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
@@ -128,9 +130,6 @@ def generar_reporte(
     Tipos disponibles: 'Individual', 'Por Área', 'Global', 'Comparativo', 'Histórico'
     Formatos: 'PDF', 'Excel'
     """
-    import os
-    from datetime import datetime
-    
     # Generar el reporte
     reporte = services.generar_reporte(db, filtros, current_user.id_usuario)
     
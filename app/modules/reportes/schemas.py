@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para reportes y notificaciones
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 
@@ -31,8 +31,7 @@ class ReporteResponse(ReporteBase):
     generado_por: int
     fecha_generacion: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ========================================
@@ -127,5 +126,4 @@ class NotificacionResponse(NotificacionBase):
     leida: bool
     fecha_envio: datetime
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
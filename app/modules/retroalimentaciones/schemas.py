@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para retroalimentaciones
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
 
@@ -34,5 +34,4 @@ class RetroalimentacionResponse(RetroalimentacionBase):
     fecha_retroalimentacion: datetime
     leido: bool
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
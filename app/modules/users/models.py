@@ -2,10 +2,10 @@
 Modelos de usuarios y roles
 ARCHIVO PRINCIPAL - Todos los demás módulos importan de aquí
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Enum, ForeignKey, Text, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class Rol(Base):
@@ -42,12 +42,21 @@ class Usuario(Base):
     fecha_ingreso = Column(Date, nullable=True)
     
     # Campos para confirmación de correo
-    token_confirmacion = Column(String(255), nullable=True)
+    # En bases existentes, token_confirmacion_hash se añade y se rellena desde
+    # los tokens en claro, para que los enlaces ya enviados sigan valiendo
+    # (token_urlsafe(32) mide 43 caracteres; descarta códigos de 6 dígitos):
+    #   ALTER TABLE usuarios ADD COLUMN token_confirmacion_hash VARBINARY(32) NULL UNIQUE;
+    #   UPDATE usuarios
+    #      SET token_confirmacion_hash = UNHEX(SHA2(token_confirmacion, 256)),
+    #          token_confirmacion = NULL
+    #    WHERE correo_confirmado = 0 AND CHAR_LENGTH(token_confirmacion) = 43;
+    token_confirmacion = Column(String(255), nullable=True)  # En desuso: los códigos de recuperación viven en Redis
+    token_confirmacion_hash = Column(LargeBinary(32), unique=True, index=True, nullable=True)  # sha256 del token de confirmación
     correo_confirmado = Column(Boolean, default=False)
     
     # Timestamps
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
-    fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=utcnow())  # Lo calcula la BD en cada UPDATE
     ultimo_acceso = Column(DateTime, nullable=True)
     
     # ============================================
@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para usuarios y roles
 """
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional
 from datetime import datetime, date
 from app.core.enums import EstadoUsuario
@@ -34,8 +34,7 @@ class RolResponse(RolBase):
     fecha_creacion: datetime
     fecha_modificacion: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UsuarioBase(BaseModel):
@@ -82,8 +81,7 @@ class UsuarioResponse(UsuarioBase):
     # Datos del rol
     rol: Optional[RolResponse] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UsuarioLogin(BaseModel):
@@ -262,8 +262,6 @@ def update_usuario(db: Session, usuario_id: int, usuario_update: UsuarioUpdate)
     for field, value in update_data.items():
         setattr(db_usuario, field, value)
     
-    db_usuario.fecha_modificacion = datetime.utcnow()
-    
     try:
         db.commit()
         db.refresh(db_usuario)
@@ -286,7 +284,6 @@ def delete_usuario(db: Session, usuario_id: int) -> dict:
         )
     
     db_usuario.estado = "Inactivo"
-    db_usuario.fecha_modificacion = datetime.utcnow()
     db.commit()
     
     return {"message": "Usuario eliminado exitosamente"}
@@ -0,0 +1,119 @@
+"""
+Serialización de peso (Numeric(5, 2)) en las respuestas de escritura
+Las escrituras no releen el objeto (commit_sin_expirar): el peso devuelto
+debe coincidir con el que devuelve una lectura posterior de la BD
+
+Ejecutar: python -m unittest discover -s tests -t .
+"""
+import json
+import os
+import tempfile
+import unittest
+import warnings
+
+_DB = os.path.join(tempfile.mkdtemp(), "test.db")
+for clave, valor in {
+    "DATABASE_URL": f"sqlite:///{_DB}",
+    "DB_HOST": "localhost", "DB_PORT": "3306", "DB_USER": "test",
+    "DB_PASSWORD": "test", "DB_NAME": "test",
+    "SECRET_KEY": "test", "ALLOWED_ORIGINS": "http://localhost",
+}.items():
+    os.environ.setdefault(clave, valor)
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import _register_models  # noqa: E402
+
+_register_models()
+
+from app.modules.formularios import services as formularios_services  # noqa: E402
+from app.modules.formularios.models import Formulario  # noqa: E402
+from app.modules.formularios.schemas import PreguntaCreate, PreguntaUpdate  # noqa: E402
+from app.modules.objetivos import services as objetivos_services  # noqa: E402
+from app.modules.objetivos.schemas import ObjetivoCreate, ObjetivoResponse, ObjetivoUpdate  # noqa: E402
+from app.modules.users.models import Rol, Usuario  # noqa: E402
+
+
+def _peso(respuesta) -> str:
+    """Peso tal como sale en el JSON de la respuesta (falla ante avisos de serialización)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        return json.loads(respuesta.model_dump_json())["peso"]
+
+
+class PesoRespuestasTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        with SessionLocal() as db:
+            rol = Rol(nombre_rol="Administrador")
+            db.add(rol)
+            db.flush()
+            usuario = Usuario(
+                nombre="Test", apellido="Test", correo="test@example.com",
+                password_hash="x", id_rol=rol.id_rol, estado="Activo"
+            )
+            db.add(usuario)
+            db.flush()
+            formulario = Formulario(
+                nombre_formulario="F", tipo_formulario="T", creado_por=usuario.id_usuario
+            )
+            db.add(formulario)
+            db.commit()
+            cls.id_usuario = usuario.id_usuario
+            cls.id_formulario = formulario.id_formulario
+
+    def _objetivo_leido(self, objetivo_id: int) -> str:
+        with SessionLocal() as db:
+            return _peso(ObjetivoResponse.model_validate(
+                objetivos_services.get_objetivo_by_id(db, objetivo_id)
+            ))
+
+    def _pregunta_leida(self, pregunta_id: int) -> str:
+        with SessionLocal() as db:
+            return _peso(formularios_services.to_pregunta_response(
+                formularios_services.get_pregunta_by_id(db, pregunta_id)
+            ))
+
+    def test_crear_objetivo_con_peso_por_defecto(self):
+        with SessionLocal() as db:
+            objetivo = objetivos_services.create_objetivo(
+                db,
+                ObjetivoCreate(id_usuario=self.id_usuario, descripcion="o", periodo="2025"),
+                self.id_usuario
+            )
+            self.assertEqual(_peso(ObjetivoResponse.model_validate(objetivo)), "1.00")
+        self.assertEqual(self._objetivo_leido(objetivo.id_objetivo), "1.00")
+
+    def test_actualizar_objetivo_con_peso_entero(self):
+        with SessionLocal() as db:
+            objetivo = objetivos_services.create_objetivo(
+                db,
+                ObjetivoCreate(id_usuario=self.id_usuario, descripcion="o", periodo="2025", peso=2),
+                self.id_usuario
+            )
+            self.assertEqual(_peso(ObjetivoResponse.model_validate(objetivo)), "2.00")
+        with SessionLocal() as db:
+            objetivo = objetivos_services.update_objetivo(
+                db, objetivo.id_objetivo, ObjetivoUpdate(peso=3)
+            )
+            self.assertEqual(_peso(ObjetivoResponse.model_validate(objetivo)), "3.00")
+        self.assertEqual(self._objetivo_leido(objetivo.id_objetivo), "3.00")
+
+    def test_crear_y_actualizar_pregunta(self):
+        with SessionLocal() as db:
+            pregunta = formularios_services.create_pregunta(
+                db, PreguntaCreate(id_formulario=self.id_formulario, texto_pregunta="p", peso=2)
+            )
+            self.assertEqual(_peso(formularios_services.to_pregunta_response(pregunta)), "2.00")
+        with SessionLocal() as db:
+            pregunta = formularios_services.update_pregunta(
+                db, pregunta.id_pregunta, PreguntaUpdate(peso="2.5")
+            )
+            self.assertEqual(_peso(formularios_services.to_pregunta_response(pregunta)), "2.50")
+        self.assertEqual(self._pregunta_leida(pregunta.id_pregunta), "2.50")
+
+
+if __name__ == "__main__":
+    unittest.main()